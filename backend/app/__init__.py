@@ -1,26 +1,81 @@
 import os
 from flask import Flask
 from flask_cors import CORS
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Initialize Supabase client
+from werkzeug.local import LocalProxy
+
+from app.clients import SupabaseClientManager
+
+# Supabase clients on a shared keep-alive connection pool, created lazily in
+# each worker process on first use. The anon key signs admins in; data calls
+# run as the signed-in admin or, with no session behind them, as the service role
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_KEY')
-supabase: Client = create_client(supabase_url, supabase_key)
+client_manager = SupabaseClientManager(
+    supabase_url,
+    supabase_key,
+    service_key=os.getenv('SUPABASE_SERVICE_ROLE_KEY') or None,
+    max_connections=int(os.getenv('SUPABASE_POOL_SIZE', '20')),
+    # Deadlines and retries for every Supabase call, plus a circuit breaker
+    resilience={
+        'read_timeout': float(os.getenv('SUPABASE_READ_TIMEOUT', '5')),
+        'write_timeout': float(os.getenv('SUPABASE_WRITE_TIMEOUT', '10')),
+        'connect_timeout': float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '2')),
+        'retries': int(os.getenv('SUPABASE_READ_RETRIES', '2')),
+    },
+    breaker_threshold=int(os.getenv('SUPABASE_BREAKER_THRESHOLD', '5')),
+    breaker_reset=float(os.getenv('SUPABASE_BREAKER_RESET', '30'))
+)
+supabase: Client = LocalProxy(client_manager.get_client)
 
 def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
     
+    # JSON logs with request IDs, written off the request thread
+    from app.logs import init_logging
+    init_logging(app)
+    
+    # orjson for jsonify when installed, and gzip/brotli for large responses
+    from app.json_provider import init_json
+    from app.compression import init_compression
+    init_json(app)
+    init_compression(app)
+    
     # Enable CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
+    # Request and Supabase call instrumentation, exposed on /metrics
+    from app.metrics import init_metrics
+    init_metrics(app, client_manager)
+    
     # Register blueprints
     from app.routes import api_bp, dashboard_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(dashboard_bp)
     
+    # Write-behind submission spool: flusher thread and CLI
+    from app.spool import submission_spool, spool_cli
+    app.cli.add_command(spool_cli)
+    if submission_spool is not None:
+        app.before_request(submission_spool.start)
+    
+    # Local read mirror of visa_applications: sync thread and CLI
+    from app.mirror import application_mirror, mirror_cli
+    app.cli.add_command(mirror_cli)
+    if application_mirror is not None:
+        app.before_request(application_mirror.start)
+    
+    # Streaming export CLI (same output as /api/applications/export)
+    from app.exports import export_cli
+    app.cli.add_command(export_cli)
+    
+    # Analytics rollup backfill CLI
+    from app.analytics import analytics_cli
+    app.cli.add_command(analytics_cli)
+    
     return app
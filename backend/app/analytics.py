@@ -0,0 +1,137 @@
+from datetime import date, datetime, timedelta
+
+import click
+
+from app.storage import store
+from app.submissions import SA_TIMEZONE
+
+# Chart buckets and the columns submissions can be split by, as kept in
+# visa_application_daily_counts (see supabase_migration_analytics_rollups.sql)
+GRANULARITIES = ('day', 'week', 'month')
+DIMENSIONS = ('destination', 'visa_type', 'form_type', 'status')
+
+ANALYTICS_DEFAULT_DAYS = 90   # range shown when no `from` is given
+ANALYTICS_MAX_BUCKETS = 1000  # buckets returned per request
+BACKFILL_CHUNK_DAYS = 31      # days recounted per call, keeps each rebuild's lock short
+
+
+def sa_today():
+    return datetime.now(SA_TIMEZONE).date()
+
+
+def bucket_start(day, granularity):
+    """The first day of the bucket holding `day`, matching Postgres date_trunc (weeks start on Monday)"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_starts(date_from, date_to, granularity):
+    """Every bucket between the two days, inclusive, so empty ones chart as zero"""
+    starts = []
+    start = bucket_start(date_from, granularity)
+    while start <= date_to:
+        starts.append(start)
+        start = next_bucket(start, granularity)
+    return starts
+
+
+def load_trends(date_from, date_to, granularity='day', group_by=None):
+    """Read submission counts per bucket (and `group_by` value) from the daily rollups"""
+    return store.trends(date_from, date_to, granularity, group_by)
+
+
+def trend_series(rows, buckets):
+    """Shape (bucket, key, count) rows into one zero-filled series per key, largest first"""
+    index = {start.isoformat(): position for position, start in enumerate(buckets)}
+    series = {}
+    for row in rows:
+        counts = series.setdefault(row['key'], [0] * len(buckets))
+        position = index.get(str(row['bucket'])[:10])
+        if position is not None:
+            counts[position] += row['count']
+    return sorted(
+        ({'key': key, 'total': sum(counts), 'counts': counts} for key, counts in series.items()),
+        key=lambda item: (-item['total'], item['key'] or '')
+    )
+
+
+def parse_analytics_args(args):
+    """Validate /api/analytics query arguments, returning (from, to, granularity, group_by)
+
+    Raises ValueError with a message for the client if they are invalid.
+    """
+    granularity = args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    group_by = args.get('group_by') or None
+    if group_by is not None and group_by not in DIMENSIONS:
+        raise ValueError(f"group_by must be one of {', '.join(DIMENSIONS)}")
+
+    bounds = {}
+    for name in ('from', 'to'):
+        if args.get(name):
+            try:
+                bounds[name] = date.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+    date_to = bounds.get('to') or sa_today()
+    date_from = bounds.get('from') or date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise ValueError('from must not be after to')
+    if len(bucket_starts(date_from, date_to, granularity)) > ANALYTICS_MAX_BUCKETS:
+        raise ValueError(f'More than {ANALYTICS_MAX_BUCKETS} {granularity}s requested; use a larger granularity')
+    return date_from, date_to, granularity, group_by
+
+
+def earliest_submission_day():
+    earliest = store.earliest_submission()
+    if earliest is None:
+        return None
+    submitted_at = datetime.fromisoformat(earliest.replace('Z', '+00:00'))
+    return submitted_at.astimezone(SA_TIMEZONE).date()
+
+
+@click.group('analytics')
+def analytics_cli():
+    """Maintain the daily submission rollups behind /api/analytics."""
+
+
+@analytics_cli.command('backfill')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='First day to recount (default: first submission).')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Last day to recount (default: today).')
+@click.option('--chunk-days', default=BACKFILL_CHUNK_DAYS, show_default=True, help='Days recounted per database call.')
+def analytics_backfill(date_from, date_to, chunk_days):
+    """Recount the rollups from visa_applications, a range of days at a time."""
+    try:
+        first = date_from.date() if date_from else earliest_submission_day()
+    except RuntimeError as e:
+        # e.g. no service role key to read with
+        raise click.ClickException(str(e))
+    last = date_to.date() if date_to else sa_today()
+    if first is None:
+        click.echo('No applications to count')
+        return
+
+    total = 0
+    start = first
+    while start <= last:
+        end = min(start + timedelta(days=chunk_days - 1), last)
+        try:
+            written = store.rebuild_rollups(start, end)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        total += written
+        click.echo(f'{start} to {end}: {written} rollup row(s)')
+        start = end + timedelta(days=1)
+    click.echo(f'Wrote {total} rollup row(s)')
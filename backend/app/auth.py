@@ -1,30 +0,0 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, logout_user, login_required
-from .models import Admin
-from . import db
-
-auth = Blueprint('auth', __name__)
-
-@auth.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        email = request.form.get('email')
-        password = request.form.get('password')
-        
-        admin = Admin.query.filter_by(email=email).first()
-        
-        if not admin or not check_password_hash(admin.password, password):
-            flash('Please check your login details and try again.')
-            return redirect(url_for('auth.login'))
-            
-        login_user(admin)
-        return redirect(url_for('main.admin'))
-        
-    return render_template('auth/login.html')
-
-@auth.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    return redirect(url_for('auth.login'))
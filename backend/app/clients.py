@@ -0,0 +1,307 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+from supabase import create_client, Client
+
+from app.resilience import CircuitBreaker, ResilientTransport
+from app.tokens import decode_claims
+
+# The signed-in admin's access token while a dashboard request is handled;
+# data calls made without one (public submissions, background threads) use
+# the service role
+request_access_token = contextvars.ContextVar('request_access_token', default=None)
+
+
+@contextmanager
+def use_access_token(access_token):
+    """Make data calls in the block run as the user the access token belongs to"""
+    reset = request_access_token.set(access_token)
+    try:
+        yield
+    finally:
+        request_access_token.reset(reset)
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose HTTP session rides on a shared keep-alive transport
+
+    Each instance only carries its own headers (API key and bearer token);
+    connections, TLS sessions and HTTP/2 streams come from the manager's pool.
+    """
+
+    def __init__(self, base_url, manager, **kwargs):
+        self._manager = manager
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=self._manager.transport,
+            follow_redirects=True,
+            event_hooks={
+                'request': [self._manager.on_request],
+                'response': [self._manager.on_response],
+            },
+        )
+
+    def aclose(self):
+        # The transport is shared, closing one client must not drop the pool
+        pass
+
+
+class SupabaseClientManager:
+    """Owns the worker's Supabase connection pool and its PostgREST clients
+
+    One keep-alive HTTP transport is created per worker process and every
+    PostgREST client handed out by the manager reuses it. Data calls go
+    through `data_client()`: a view authenticated with the admin's own access
+    token during dashboard requests, so row level security applies as that
+    user, and the service role client otherwise. Token views are cached in a
+    bounded LRU and expire together with the token.
+
+    The anon key (`supabase_key`) is only used for Supabase Auth.
+
+    Nothing connects until the first call: the transport and the service
+    client are created on first use, and a forked child drops whatever it
+    inherited so a preloading server never shares sockets between workers.
+
+    Every call goes through a ResilientTransport (deadlines, retries of
+    reads, circuit breaker) configured by `resilience`, whatever transport
+    sits underneath.
+    """
+
+    def __init__(self, supabase_url, supabase_key, service_key=None, max_connections=20, max_views=256,
+                 max_view_ttl=3600, resilience=None, breaker_threshold=5, breaker_reset=30.0):
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.service_key = service_key
+        self.rest_url = f'{supabase_url}/rest/v1' if supabase_url else None
+        self.max_connections = max_connections
+        self.max_views = max_views
+        self.max_view_ttl = max_view_ttl
+        self.resilience = resilience or {}
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        # Extra httpx hooks (e.g. metrics) run for every pooled PostgREST call
+        self.request_hooks = [self.track_request]
+        self.response_hooks = []
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Also the post-fork hook: the parent's locks, sockets and clients are not ours to use
+        self._transport = None
+        self._base_transport = None
+        self.breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        self._client = None
+        self._service_client = None
+        self._auth_http = None
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'connections_opened': 0,
+            'tls_handshakes': 0,
+            'view_hits': 0,
+            'view_misses': 0,
+            'view_evictions': 0,
+        }
+
+    @property
+    def transport(self):
+        """This process's keep-alive transport, opened on first use and wrapped for resilience"""
+        if self._transport is None:
+            with self._lock:
+                if self._transport is None:
+                    self._base_transport = httpx.HTTPTransport(
+                        http2=True,
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections,
+                            keepalive_expiry=60,
+                        ),
+                    )
+                    self._transport = ResilientTransport(self._base_transport, self.breaker, **self.resilience)
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        # e.g. a mock transport in benchmarks; it still gets deadlines, retries and the breaker
+        self._base_transport = transport
+        self._transport = ResilientTransport(transport, self.breaker, **self.resilience)
+
+    def get_client(self) -> Client:
+        """Return this process's anon Supabase client (Supabase Auth), creating it on first use"""
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.create_client()
+                client = self._client
+        return client
+
+    def refresh_session(self, refresh_token):
+        """Exchange a refresh token for a new session with Supabase Auth, on the shared pool
+
+        Returns the token response (access_token, refresh_token, expires_at, ...).
+        Unlike the anon client's auth methods this leaves that client's own
+        session untouched.
+        """
+        response = self._auth().post('/token', params={'grant_type': 'refresh_token'},
+                                     json={'refresh_token': refresh_token})
+        response.raise_for_status()
+        return response.json()
+
+    def get_user(self, access_token):
+        """Ask Supabase Auth for the user an access token belongs to, raising if it is not valid"""
+        response = self._auth().get('/user', headers={'Authorization': f'Bearer {access_token}'})
+        response.raise_for_status()
+        return response.json()
+
+    def _auth(self):
+        if self._auth_http is None:
+            # Never closed: closing an httpx client would close the shared transport
+            self._auth_http = httpx.Client(
+                base_url=f'{self.supabase_url}/auth/v1',
+                headers={'apikey': self.supabase_key},
+                transport=self.transport,
+                timeout=10,
+            )
+        return self._auth_http
+
+    def warm_up(self):
+        """Build the clients and their PostgREST sessions without sending a request"""
+        self.get_client().postgrest
+        if self.service_key:
+            self.service_client()
+
+    def create_client(self) -> Client:
+        """Create the anon Supabase client with its PostgREST calls on the shared pool"""
+        client = create_client(self.supabase_url, self.supabase_key)
+        # supabase-py rebuilds its PostgREST client on every auth event;
+        # make each rebuild reuse the pool instead of opening a new one
+        client._init_postgrest_client = self._create_postgrest_client
+        client._postgrest = None
+        return client
+
+    def data_client(self):
+        """The PostgREST client for data calls made in the current context
+
+        Inside a dashboard request this is the signed-in admin's token view,
+        anywhere else the service role client.
+        """
+        access_token = request_access_token.get()
+        if access_token is None:
+            return self.service_client()
+        view = self.for_token(access_token)
+        if view is None:
+            raise PermissionError('The admin session token has expired')
+        return view
+
+    def service_client(self):
+        """PostgREST client with the service role key, for work no admin session is behind
+
+        Public submissions, background threads (mirror sync, stats
+        reconcile, spool flush) and maintenance commands use it.
+        """
+        client = self._service_client
+        if client is None:
+            if not self.service_key:
+                raise RuntimeError('SUPABASE_SERVICE_ROLE_KEY is not set (Project Settings > API)')
+            with self._lock:
+                if self._service_client is None:
+                    self._service_client = self.postgrest_for_key(self.service_key)
+                client = self._service_client
+        return client
+
+    def for_token(self, access_token):
+        """Return a PostgREST client authenticated as the given user, or None if the token is expired"""
+        now = time.time()
+        with self._lock:
+            cached = self._views.get(access_token)
+            if cached and cached[1] > now:
+                self._views.move_to_end(access_token)
+                self._stats['view_hits'] += 1
+                return cached[0]
+            self._views.pop(access_token, None)
+
+        claims = decode_claims(access_token)
+        if not claims or not isinstance(claims.get('exp'), (int, float)) or claims['exp'] <= now:
+            return None
+
+        view = self._create_postgrest_client(
+            rest_url=self.rest_url,
+            headers={
+                'apiKey': self.supabase_key,
+                'Authorization': f'Bearer {access_token}',
+            },
+            schema='public',
+        )
+        expires_at = min(claims['exp'], now + self.max_view_ttl)
+
+        with self._lock:
+            self._stats['view_misses'] += 1
+            self._views[access_token] = (view, expires_at)
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+                self._stats['view_evictions'] += 1
+        return view
+
+    def postgrest_for_key(self, api_key):
+        """A PostgREST client on the shared pool that authenticates with another API key"""
+        return self._create_postgrest_client(
+            rest_url=self.rest_url,
+            headers={'apiKey': api_key, 'Authorization': f'Bearer {api_key}'},
+            schema='public',
+        )
+
+    def stats(self):
+        """Connection reuse and view cache counters for health reporting"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_views'] = len(self._views)
+        # Only a real connection pool can report its connections
+        pool = getattr(self._base_transport, '_pool', None)
+        stats['open_connections'] = len(pool.connections) if pool is not None else 0
+        if stats['requests']:
+            stats['connection_reuse_ratio'] = round(1 - stats['connections_opened'] / stats['requests'], 4)
+        return stats
+
+    def on_request(self, request):
+        for hook in self.request_hooks:
+            hook(request)
+
+    def on_response(self, response):
+        for hook in self.response_hooks:
+            hook(response)
+
+    def track_request(self, request):
+        """httpx request hook counting requests and, via a trace callback, new connections"""
+        with self._lock:
+            self._stats['requests'] += 1
+        request.extensions['trace'] = self._trace
+
+    def _trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            key = 'connections_opened'
+        elif event_name == 'connection.start_tls.complete':
+            key = 'tls_handshakes'
+        else:
+            return
+        with self._lock:
+            self._stats[key] += 1
+
+    def _create_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        kwargs = {'headers': headers, 'schema': schema}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        return PooledPostgrestClient(rest_url, self, **kwargs)
@@ -0,0 +1,98 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is offered instead
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'image/svg+xml',
+}
+
+
+class Compressor:
+    """Negotiated gzip/brotli compression of buffered responses above a size threshold
+
+    Streaming responses (server-sent events, exports) are left alone so they
+    keep flushing chunk by chunk. Bodies that carry an ETag are the same
+    bytes on every hit, so their compressed form is memoized per ETag.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=5, brotli_quality=4, max_cached=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def after_request(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+
+        encoding = self.choose_encoding()
+        if encoding is None or (response.content_length or 0) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        key = (etag, encoding) if etag else None
+        with self._lock:
+            compressed = self._cache.get(key) if key else None
+            if compressed is not None:
+                self._cache.move_to_end(key)
+
+        if compressed is None:
+            compressed = self.compress(response.get_data(), encoding)
+            if key:
+                with self._lock:
+                    self._cache[key] = compressed
+                    while len(self._cache) > self.max_cached:
+                        self._cache.popitem(last=False)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # The compressed bytes differ from the identity body; mark the tag weak
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_compression(app):
+    """Compress JSON and HTML responses for clients that accept gzip or brotli
+
+    COMPRESS_MIN_SIZE (bytes, default 1024) sets the threshold; set
+    COMPRESS_RESPONSES=0 to turn compression off, e.g. behind a proxy that
+    already compresses.
+    """
+    if os.getenv('COMPRESS_RESPONSES', '1').lower() in ('0', 'false', 'no'):
+        return
+    compressor = Compressor(
+        min_size=int(os.getenv('COMPRESS_MIN_SIZE', '1024')),
+        gzip_level=int(os.getenv('COMPRESS_LEVEL', '5'))
+    )
+    app.after_request(compressor.after_request)
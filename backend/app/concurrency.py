@@ -0,0 +1,55 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class UpstreamPool:
+    """Runs a request's independent Supabase calls concurrently
+
+    The calls are blocking PostgREST requests on the shared HTTP/2 transport,
+    so a handful of threads is enough to overlap their network waits. The
+    first call runs on the request thread and the rest on the pool, each in a
+    copy of the caller's context so Flask globals and log request IDs still
+    resolve. Calls made from the pool must not gather again.
+    """
+
+    def __init__(self, max_workers=16):
+        self.max_workers = max_workers
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A forked child inherits the executor but none of its threads
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def gather(self, *calls):
+        """Run the zero-argument callables and return their results in order
+
+        If any call raises, the exception is re-raised once all of them have
+        finished.
+        """
+        if self.max_workers <= 0 or len(calls) < 2:
+            return [call() for call in calls]
+
+        executor = self._get_executor()
+        futures = [executor.submit(contextvars.copy_context().run, call) for call in calls[1:]]
+        try:
+            first = calls[0]()
+        finally:
+            # Never leave calls running past the request that started them
+            wait(futures)
+        return [first] + [future.result() for future in futures]
+
+    def _get_executor(self):
+        # Threads are started on first use, after the server has forked its workers
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='upstream')
+        return self._executor
+
+
+# Shared by all requests handled by this worker process; 0 runs calls one after another
+upstream_pool = UpstreamPool(max_workers=int(os.getenv('UPSTREAM_CONCURRENCY', '16')))
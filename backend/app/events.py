@@ -0,0 +1,123 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT_INTERVAL = 15
+
+
+class Broadcaster:
+    """In-process fan-out of dashboard events to every connected SSE stream
+
+    publish() only enqueues the event, so the request that caused the change
+    never waits on subscribers. A single dispatcher thread resolves the
+    payload, serializes it once and hands the same message to every stream.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._events = queue.Queue()
+        self._dispatcher = None
+        self._next_id = 1
+
+    def subscribe(self):
+        """Register a new stream and return the queue its messages arrive on"""
+        subscription = queue.Queue(maxsize=self.max_pending)
+        subscription.overflowed = False
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event, data):
+        """Queue an event for all subscribers
+
+        `data` may be a callable, in which case it is evaluated once on the
+        dispatcher thread and only when at least one dashboard is listening.
+        """
+        if not self.has_subscribers():
+            return
+        self._ensure_dispatcher()
+        self._events.put((event, data))
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_forever, name='sse-dispatcher', daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch_forever(self):
+        while True:
+            event, data = self._events.get()
+            try:
+                self._dispatch(event, data() if callable(data) else data)
+            except Exception:
+                logger.exception('Error dispatching %s event', event)
+
+    def _dispatch(self, event, data):
+        message = format_sse(event, data, self._next_id)
+        self._next_id += 1
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                # Too slow to keep up; drop it so it reconnects and catches up via refresh
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+
+    def stream(self, subscription, expires_at=None):
+        """Yield SSE messages for one subscription until it is dropped, closed or `expires_at` passes
+
+        `expires_at` is the session token's expiry (epoch seconds); the
+        browser then reconnects, which re-checks and refreshes the session.
+        """
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield 'retry: 5000\n\n'
+            while True:
+                timeout = HEARTBEAT_INTERVAL
+                if expires_at is not None:
+                    remaining = expires_at - time.time()
+                    if remaining <= 0:
+                        return
+                    timeout = min(timeout, remaining)
+                try:
+                    yield subscription.get(timeout=timeout)
+                except queue.Empty:
+                    if subscription.overflowed:
+                        return
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+
+def format_sse(event, data, event_id=None):
+    """Serialize an event in text/event-stream format"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+# Shared by all requests handled by this worker process
+broadcaster = Broadcaster()
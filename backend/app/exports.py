@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime, time, timedelta
+
+import click
+import pytz
+
+from app.storage import store
+from app.submissions import SA_TIMEZONE
+
+# Columns written to exports, in CSV header order
+EXPORT_COLUMNS = [
+    'id', 'name', 'email', 'phone', 'country_applying_from', 'passport_country',
+    'destination', 'travel_date', 'return_date', 'visa_type', 'communication_method',
+    'message', 'form_type', 'status', 'submitted_at', 'updated_at'
+]
+
+EXPORT_PAGE_SIZE = 1000          # rows fetched per keyset page
+EXPORT_CHUNK_BYTES = 64 * 1024   # bytes buffered before a chunk is yielded
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def parse_export_date(value):
+    """Parse a YYYY-MM-DD or ISO-8601 filter bound, returning None if invalid"""
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def date_bound(value, end=False):
+    """Timestamp bound for a date filter: plain dates are whole South African days, `end` includes the day"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else pytz.utc.localize(value)
+    day = value + timedelta(days=1) if end else value
+    return SA_TIMEZONE.localize(datetime.combine(day, time.min))
+
+
+def iter_applications(statuses=None, date_from=None, date_to=None, page_size=EXPORT_PAGE_SIZE):
+    """Yield applications oldest first, one keyset page at a time
+
+    Only one page is held in memory, and each page continues after the
+    (submitted_at, id) of the previous one, so every query is an index range
+    scan no matter how deep into the table the export is.
+    """
+    start = date_bound(date_from) if date_from else None
+    end = date_bound(date_to, end=True) if date_to else None
+    return store.iter_applications(EXPORT_COLUMNS, statuses, start, end, page_size)
+
+
+# Leading characters that make a spreadsheet treat a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_formula(value):
+    """Quote a text cell that a spreadsheet would otherwise evaluate as a formula
+
+    Applicants fill in most columns, so a message like `=HYPERLINK(...)`
+    must open as text. The `'` prefix is what spreadsheets themselves use
+    to mark a cell as text.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(rows):
+    """Encode rows as CSV, yielding roughly EXPORT_CHUNK_BYTES at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({column: escape_formula(value) for column, value in row.items()})
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows):
+    """Encode rows as newline-delimited JSON, yielding roughly EXPORT_CHUNK_BYTES at a time"""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({column: row.get(column) for column in EXPORT_COLUMNS}, default=str) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(lines)
+            lines.clear()
+            size = 0
+    yield ''.join(lines)
+
+
+def export_chunks(export_format, **filters):
+    encode = csv_chunks if export_format == 'csv' else ndjson_chunks
+    return encode(iter_applications(**filters))
+
+
+@click.command('export')
+@click.option('--format', 'export_format', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--status', 'statuses', multiple=True, help='Only export this status; repeatable.')
+@click.option('--from', 'date_from', help='Submitted on or after this date (YYYY-MM-DD).')
+@click.option('--to', 'date_to', help='Submitted on or before this date (YYYY-MM-DD).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), help='Write to a file instead of stdout.')
+def export_cli(export_format, statuses, date_from, date_to, output):
+    """Stream all applications to CSV or NDJSON."""
+    bounds = {}
+    for name, value in (('date_from', date_from), ('date_to', date_to)):
+        if value:
+            bounds[name] = parse_export_date(value)
+            if bounds[name] is None:
+                raise click.BadParameter(f'{value!r} is not a date', param_hint=name.replace('date_', '--'))
+
+    out = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    try:
+        for chunk in export_chunks(export_format, statuses=list(statuses), **bounds):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
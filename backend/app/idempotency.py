@@ -0,0 +1,180 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import request
+
+# Client-supplied idempotency keys, e.g. a UUID per form submission
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{8,128}$')
+
+
+def request_idempotency_key(data):
+    """The submission's Idempotency-Key header, or the `idempotency_key` form field
+
+    The form field covers submissions that cannot set headers, such as the
+    plain HTML form post used by the website's fallback. Invalid keys are
+    ignored.
+    """
+    value = (request.headers.get('Idempotency-Key') or data.get('idempotency_key') or '').strip()
+    return value if IDEMPOTENCY_KEY_PATTERN.match(value) else None
+
+
+def lead_fingerprint(record):
+    """Hash of the applicant's normalized email and phone, or None without either"""
+    email = (record.get('email') or '').strip().lower()
+    phone = re.sub(r'\D', '', record.get('phone') or '')
+    if not email and not phone:
+        return None
+    return hashlib.blake2b(f'{email}|{phone}'.encode(), digest_size=16).hexdigest()
+
+
+class _Entry:
+    __slots__ = ('expires_at', 'result', 'done')
+
+    def __init__(self, expires_at, done):
+        self.expires_at = expires_at
+        self.result = None
+        self.done = done
+
+
+class Claim:
+    """A submission's hold on its dedup keys until it completes or is released"""
+
+    def __init__(self, cache, entries, replay=None):
+        self._cache = cache
+        self._entries = entries
+        self.replay = replay
+
+    def complete(self, result):
+        """Remember the outcome so duplicates are answered with it"""
+        if self._entries:
+            self._cache._complete(self._entries, result)
+            self._entries = None
+
+    def release(self):
+        """Give the keys up without a result, e.g. after an error; safe to call twice"""
+        if self._entries:
+            self._cache._release(self._entries)
+            self._entries = None
+
+
+class SubmissionDedup:
+    """Recent submission outcomes keyed by idempotency key and by lead, in a bounded TTL LRU
+
+    A submission first claims its keys. If any of them already has an
+    outcome, that outcome is replayed without touching the database; if
+    another request holds the key, the duplicate waits up to `wait` seconds
+    for it to finish. Outcomes are kept for `key_ttl` seconds under the
+    client's idempotency key and for `window` seconds under the lead.
+
+    The lead key is also written to the row's `submission_key`, whose unique
+    index catches duplicates of the same applicant that reach other worker
+    processes. Idempotency keys are only stored there when there is no lead
+    key (lead dedup disabled, or neither email nor phone given).
+
+    Lead keys name a fixed window (`window` seconds since the epoch), in
+    memory and in the database alike, so every worker agrees on the key.
+    Two submissions either side of a window boundary get different keys
+    and are both stored, however close together they are.
+    """
+
+    def __init__(self, window=600, key_ttl=86400, max_entries=10000, wait=5.0, claim_ttl=30.0):
+        self.window = window
+        self.key_ttl = key_ttl
+        self.max_entries = max_entries
+        self.wait = wait
+        self.claim_ttl = claim_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'replayed': 0, 'claimed': 0}
+
+    def keys_for(self, idempotency_key, record):
+        """Cache keys for a normalized submission, most specific first"""
+        keys = []
+        if idempotency_key:
+            keys.append(f'key:{idempotency_key}')
+        fingerprint = lead_fingerprint(record) if self.window > 0 else None
+        if fingerprint:
+            keys.append(f'lead:{fingerprint}:{int(time.time() // self.window)}')
+        return keys
+
+    def submission_key(self, keys):
+        """The row's submission_key: the lead key, else the idempotency key, else a random one
+
+        The lead key goes first because the form sends a fresh idempotency
+        key with every submission, so those never collide in the database.
+        """
+        for key in keys:
+            if key.startswith('lead:'):
+                return key
+        return keys[0] if keys else str(uuid.uuid4())
+
+    def claim(self, keys):
+        """Claim the keys, or return a Claim whose `replay` holds an earlier outcome"""
+        deadline = time.monotonic() + self.wait
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                pending = None
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is None or entry.expires_at <= now:
+                        continue
+                    if entry.result is not None:
+                        self._entries.move_to_end(key)
+                        self._stats['replayed'] += 1
+                        return Claim(self, None, replay=entry.result)
+                    pending = entry
+
+                if pending is None or now >= deadline:
+                    # Nobody has it, or the holder is taking too long: go ahead,
+                    # the database's unique submission_key still guards the insert
+                    done = threading.Event()
+                    entries = {}
+                    for key in keys:
+                        entries[key] = self._entries[key] = _Entry(now + self.claim_ttl, done)
+                        self._entries.move_to_end(key)
+                    self._evict()
+                    self._stats['claimed'] += 1
+                    return Claim(self, entries)
+
+            pending.done.wait(max(deadline - now, 0))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+    def _complete(self, entries, result):
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in entries.items():
+                entry.result = result
+                entry.expires_at = now + (self.key_ttl if key.startswith('key:') else self.window)
+        next(iter(entries.values())).done.set()
+
+    def _release(self, entries):
+        with self._lock:
+            for key, entry in entries.items():
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        next(iter(entries.values())).done.set()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            # Wake anyone waiting on an evicted claim; they will claim for themselves
+            entry.done.set()
+
+
+# Shared by all requests handled by this worker process; a 0 window keeps only idempotency keys
+submission_dedup = SubmissionDedup(
+    window=int(os.getenv('SUBMISSION_DEDUP_WINDOW', '600')),
+    key_ttl=int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400')),
+    max_entries=int(os.getenv('SUBMISSION_DEDUP_SIZE', '10000'))
+)
@@ -0,0 +1,48 @@
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib provider is used instead
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson
+
+    Keys are not sorted and datetimes are written as ISO-8601 rather than
+    HTTP dates; everything the app returns comes from Supabase as plain JSON
+    types, so responses are otherwise identical to the default provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj, kwargs.get('indent')).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        # Build the body as bytes directly, skipping the str round trip
+        return self._app.response_class(self._encode(obj, indent) + b'\n', mimetype=self.mimetype)
+
+    def _encode(self, obj, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+
+def init_json(app):
+    """Use orjson for jsonify and request parsing when available
+
+    JSON_PROVIDER may be `auto` (default: orjson if installed), `orjson` or
+    `stdlib`.
+    """
+    choice = os.getenv('JSON_PROVIDER', 'auto').lower()
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+    if choice in ('auto', 'orjson') and orjson is not None:
+        app.json = OrjsonProvider(app)
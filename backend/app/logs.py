@@ -0,0 +1,179 @@
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+# Request IDs accepted from upstream proxies; anything else is replaced
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# Submission fields that identify an applicant and are never logged verbatim
+SENSITIVE_FIELDS = {
+    'name', 'fullName', 'email', 'emailAddress', 'phone', 'phoneNumber',
+    'message', 'notes', 'passport', 'passportNumber', 'idNumber', 'address',
+}
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, request ID and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID and drop unsampled low-level records
+
+    Sampling is decided per request from its ID, so a sampled request keeps
+    all of its log lines. Warnings and errors are always kept.
+    """
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        return is_sampled(record.request_id, self.sample_rate)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback now, on the calling thread, but
+        # leave JSON encoding and the write to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def is_sampled(request_id, sample_rate):
+    if sample_rate <= 0:
+        return False
+    if not request_id:
+        return True
+    digest = hashlib.blake2b(request_id.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') / 0xFFFFFFFF < sample_rate
+
+
+def payload_logging_enabled():
+    return os.getenv('LOG_PAYLOADS', '').lower() in ('1', 'true', 'yes')
+
+
+def redact(data):
+    """Copy of a submission with applicant-identifying values masked"""
+    redacted = {}
+    for key, value in data.items():
+        if key not in SENSITIVE_FIELDS or value in (None, ''):
+            redacted[key] = value
+        elif 'email' in key.lower() and '@' in str(value):
+            redacted[key] = '***@' + str(value).rpartition('@')[2]
+        elif 'phone' in key.lower():
+            redacted[key] = '***' + str(value)[-3:]
+        else:
+            redacted[key] = f'[redacted {len(str(value))} chars]'
+    return redacted
+
+
+def log_payload(logger, message, data):
+    """Log a redacted request payload at DEBUG, only when LOG_PAYLOADS is enabled"""
+    if payload_logging_enabled() and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, extra={'payload': redact(data)})
+
+
+def _assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+    g._log_started_at = time.perf_counter()
+
+
+def _log_request(response):
+    started_at = g.pop('_log_started_at', None)
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    if started_at is not None and request.endpoint != 'metrics':
+        logging.getLogger('app.requests').info('%s %s %s', request.method, request.path, response.status_code, extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 2),
+        })
+    return response
+
+
+def _start_writer(queue_handler, handler):
+    # A fresh queue each time: one inherited across a fork may hold a locked mutex
+    queue_handler.queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    listener = logging.handlers.QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def init_logging(app):
+    """Route the `app` loggers through a background JSON writer and add request IDs
+
+    Configured with LOG_LEVEL (default INFO), LOG_SAMPLE_RATE (share of
+    requests whose INFO/DEBUG lines are kept, default 1), LOG_QUEUE_SIZE and
+    LOG_PAYLOADS (opt-in redacted submission payloads at DEBUG).
+    """
+    logger = logging.getLogger('app')
+    if not any(isinstance(handler, NonBlockingQueueHandler) for handler in logger.handlers):
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+
+        queue_handler = NonBlockingQueueHandler(None)
+        queue_handler.addFilter(RequestContextFilter(float(os.getenv('LOG_SAMPLE_RATE', '1'))))
+        logger.addHandler(queue_handler)
+        logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        logger.propagate = False
+
+        _start_writer(queue_handler, stream_handler)
+        # The writer thread does not survive a fork (e.g. gunicorn --preload); start one in the child
+        os.register_at_fork(after_in_child=lambda: _start_writer(queue_handler, stream_handler))
+
+    app.before_request(_assign_request_id)
+    app.after_request(_log_request)
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+# Latency buckets in seconds, shared by request and upstream histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    metric_type = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} {self.metric_type}'
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {value}'
+
+
+class Gauge(Counter):
+    metric_type = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # Per-bucket counts plus sum and count; made cumulative on collect
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            values = [(labels, (list(series[0]), series[1], series[2])) for labels, series in self._values.items()]
+        for label_values, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{_format_labels(self.labels, label_values, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, label_values)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labels, label_values)} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable yielding extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                lines.append(f'# collector error: {str(e)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status code',
+    ('endpoint', 'method', 'status')))
+http_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by endpoint',
+    ('endpoint', 'method')))
+http_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled'))
+upstream_requests = registry.register(Counter(
+    'supabase_requests_total', 'Supabase PostgREST calls by table, operation and status code',
+    ('table', 'operation', 'status')))
+upstream_latency = registry.register(Histogram(
+    'supabase_request_duration_seconds', 'Supabase PostgREST call latency by table and operation',
+    ('table', 'operation')))
+upstream_rows = registry.register(Counter(
+    'supabase_rows_returned_total', 'Rows returned by Supabase PostgREST calls',
+    ('table', 'operation')))
+upstream_bytes = registry.register(Counter(
+    'supabase_response_bytes_total', 'Response body bytes received from Supabase PostgREST',
+    ('table', 'operation')))
+
+
+def _before_request():
+    g._metrics_started_at = time.perf_counter()
+    http_in_flight.inc()
+
+
+def _after_request(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    started_at = g.pop('_metrics_started_at', None)
+    if started_at is None:
+        return
+    http_in_flight.dec()
+    endpoint = request.endpoint or 'unmatched'
+    status = g.pop('_metrics_status', 500)
+    http_requests.inc(endpoint, request.method, str(status))
+    http_latency.observe(endpoint, request.method, value=time.perf_counter() - started_at)
+
+
+def describe_upstream_call(request):
+    """Map a PostgREST request to (table, operation) labels"""
+    path = request.url.path.split('/rest/v1/', 1)[-1].strip('/')
+    if path.startswith('rpc/'):
+        return path[4:], 'rpc'
+    method = request.method
+    if method == 'POST':
+        prefer = request.headers.get('prefer', '')
+        return path, 'upsert' if 'resolution=' in prefer else 'insert'
+    return path, {'GET': 'select', 'HEAD': 'count', 'PATCH': 'update', 'DELETE': 'delete'}.get(method, method.lower())
+
+
+def rows_from_content_range(value):
+    """Number of rows in a PostgREST Content-Range header such as '0-9/120'"""
+    if not value:
+        return None
+    span = value.split('/', 1)[0]
+    if '-' not in span:
+        return 0
+    start, _, end = span.partition('-')
+    try:
+        return int(end) - int(start) + 1
+    except ValueError:
+        return None
+
+
+def start_upstream_timer(request):
+    """httpx request hook: remember when the call started"""
+    request.extensions['metrics_started_at'] = time.perf_counter()
+
+
+def record_upstream_call(response):
+    """httpx response hook: record latency, status, rows and bytes of a PostgREST call"""
+    started_at = response.request.extensions.get('metrics_started_at')
+    response.read()
+    table, operation = describe_upstream_call(response.request)
+
+    if started_at is not None:
+        upstream_latency.observe(table, operation, value=time.perf_counter() - started_at)
+    upstream_requests.inc(table, operation, str(response.status_code))
+    upstream_bytes.inc(table, operation, amount=len(response.content))
+
+    rows = rows_from_content_range(response.headers.get('content-range'))
+    if rows:
+        upstream_rows.inc(table, operation, amount=rows)
+
+
+def metrics_view():
+    """Prometheus text exposition of all metrics"""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app, client_manager=None):
+    """Install request instrumentation, Supabase call timing and the /metrics endpoint"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    if client_manager is not None:
+        client_manager.request_hooks.append(start_upstream_timer)
+        client_manager.response_hooks.append(record_upstream_call)
+
+        def pool_collector():
+            yield '# TYPE supabase_pool_stat gauge'
+            for name, value in sorted(client_manager.stats().items()):
+                yield f'supabase_pool_stat{{stat="{name}"}} {value}'
+
+        registry.register_collector(pool_collector)
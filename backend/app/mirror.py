@@ -0,0 +1,432 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+import pytz
+
+from app import client_manager
+from app.storage import storage_backend
+
+logger = logging.getLogger(__name__)
+
+# Bump when the local schema changes; an older file is rebuilt from scratch
+SCHEMA_VERSION = '1'
+
+
+def epoch(value):
+    """Seconds since the epoch for a timestamp as PostgREST returns it
+
+    Postgres trims trailing zeros from fractional seconds, so timestamps are
+    compared as numbers rather than as strings.
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = pytz.utc.localize(parsed)
+    return parsed.timestamp()
+
+
+def project(row, columns):
+    return row if columns is None else {column: row.get(column) for column in columns}
+
+
+class ApplicationMirror:
+    """Local SQLite copy of visa_applications for dashboard reads
+
+    A background thread polls Supabase for rows whose `updated_at` moved past
+    the last one applied (re-reading a small overlap, like the dashboard's
+    own refresh) and for new deletion tombstones. The mirror is rebuilt from
+    a full copy when it is new, when it has not synced for longer than
+    tombstones are kept, or when its per-status counts disagree with the
+    database on two checks in a row, which means a change was missed.
+
+    Reads are only answered while the last successful sync started less than
+    `max_staleness` seconds ago; otherwise every read method returns None and
+    the caller goes to Supabase. Writes made through this app are applied to
+    the mirror right away so admins see their own changes.
+
+    Every worker process reads the same file; only the process holding the
+    mirror's lock file runs the sync thread. The sync reads with the service
+    role key: it runs outside any admin session, and the anon role may not
+    read applications.
+    """
+
+    def __init__(self, path, poll_interval=2.0, max_staleness=10.0, page_size=1000,
+                 verify_interval=60.0, overlap=5.0, retention=timedelta(days=6), max_backoff=60.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.page_size = page_size
+        self.verify_interval = verify_interval
+        self.overlap = overlap
+        # Resync if offline longer than this: upstream tombstones (kept 7 days) may be gone
+        self.retention = retention
+        self.max_backoff = max_backoff
+        self._local = threading.local()
+        self._syncer = None
+        self._sync_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'fallbacks': 0, 'polls': 0, 'resyncs': 0, 'sync_errors': 0}
+        self._init_db()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not cross a fork; each worker opens its own
+        self._local = threading.local()
+        self._syncer = None
+        self._sync_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # A lost write is repaired by the next sync, so don't fsync every commit
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            version = conn.execute("SELECT value FROM state WHERE key = 'schema_version'").fetchone()
+            if version is not None and version['value'] != SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS applications')
+                conn.execute('DROP TABLE IF EXISTS tombstones')
+                conn.execute('DELETE FROM state')
+            for table in ('applications', 'applications_staging'):
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY,
+                        submitted_ts REAL NOT NULL,
+                        updated_ts REAL NOT NULL,
+                        status TEXT,
+                        data TEXT NOT NULL
+                    )
+                """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_mirror_submitted ON applications(submitted_ts DESC, id DESC)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_mirror_updated ON applications(updated_ts)')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tombstones (
+                    id INTEGER PRIMARY KEY,
+                    deleted_ts REAL NOT NULL,
+                    deleted_at TEXT NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_mirror_deleted ON tombstones(deleted_ts)')
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+
+    # Reads
+
+    def page(self, columns, limit, offset=0, after=None):
+        """A dashboard page newest first and the refresh watermark, or None if the mirror is stale
+
+        `after` is a keyset cursor of (submitted_at, id) from the previous page.
+        """
+        def read(conn):
+            if after:
+                submitted_at, last_id = after
+                cutoff = epoch(submitted_at)
+                rows = conn.execute(
+                    'SELECT data FROM applications WHERE submitted_ts < ? OR (submitted_ts = ? AND id < ?) '
+                    'ORDER BY submitted_ts DESC, id DESC LIMIT ?', (cutoff, cutoff, last_id, limit))
+            else:
+                rows = conn.execute('SELECT data FROM applications ORDER BY submitted_ts DESC, id DESC LIMIT ? OFFSET ?',
+                                    (limit, offset))
+            return [project(json.loads(row['data']), columns) for row in rows], self._state(conn).get('changes_after')
+        return self._read(read)
+
+    def get(self, app_id):
+        """One application, or None if the mirror is stale or does not have it (yet)"""
+        def read(conn):
+            row = conn.execute('SELECT data FROM applications WHERE id = ?', (app_id,)).fetchone()
+            return json.loads(row['data']) if row else None
+        return self._read(read)
+
+    def all(self):
+        """Every application newest first, or None if the mirror is stale"""
+        return self._read(lambda conn: [json.loads(row['data']) for row in
+                                        conn.execute('SELECT data FROM applications ORDER BY submitted_ts DESC, id DESC')])
+
+    def changes(self, since, limit, columns):
+        """(changed rows, deletion tombstones) after the `since` datetime, at most `limit` of each, or None if stale"""
+        def read(conn):
+            cutoff = since.timestamp()
+            changed = conn.execute('SELECT data FROM applications WHERE updated_ts > ? ORDER BY updated_ts LIMIT ?',
+                                   (cutoff, limit))
+            deleted = conn.execute('SELECT id, deleted_at FROM tombstones WHERE deleted_ts > ? ORDER BY deleted_ts LIMIT ?',
+                                   (cutoff, limit))
+            return [project(json.loads(row['data']), columns) for row in changed], [dict(row) for row in deleted]
+        return self._read(read)
+
+    def _read(self, read):
+        try:
+            conn = self._connect()
+            with conn:
+                # One transaction, so the freshness check and the rows come from the same snapshot
+                conn.execute('BEGIN')
+                synced_at = float(self._state(conn).get('synced_at', 0))
+                result = read(conn) if time.time() - synced_at <= self.max_staleness else None
+        except Exception:
+            logger.exception('Error reading application mirror')
+            result = None
+        self._count('fallbacks' if result is None else 'hits')
+        return result
+
+    def _state(self, conn):
+        return {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM state')}
+
+    # Writes made through this app
+
+    def apply(self, rows):
+        """Store rows returned by an insert or update; an older copy never replaces a newer one"""
+        try:
+            with self._connect() as conn:
+                self._upsert(conn, 'applications', rows)
+        except Exception:
+            logger.exception('Error applying writes to application mirror')
+
+    def remove(self, ids):
+        """Drop deleted applications and keep a tombstone for dashboard refreshes"""
+        now = datetime.now(pytz.utc)
+        try:
+            with self._connect() as conn:
+                self._delete(conn, [{'id': app_id, 'deleted_at': now.isoformat()} for app_id in ids])
+        except Exception:
+            logger.exception('Error applying deletes to application mirror')
+
+    def _upsert(self, conn, table, rows):
+        conn.executemany(f"""
+            INSERT INTO {table} (id, submitted_ts, updated_ts, status, data)
+            SELECT :id, :submitted_ts, :updated_ts, :status, :data
+            WHERE NOT EXISTS (SELECT 1 FROM tombstones WHERE id = :id AND deleted_ts >= :updated_ts)
+            ON CONFLICT (id) DO UPDATE SET
+                submitted_ts = excluded.submitted_ts, updated_ts = excluded.updated_ts,
+                status = excluded.status, data = excluded.data
+            WHERE excluded.updated_ts >= {table}.updated_ts
+        """, [{
+            'id': row['id'],
+            'submitted_ts': epoch(row['submitted_at']),
+            'updated_ts': epoch(row['updated_at']),
+            'status': row.get('status'),
+            'data': json.dumps(row)
+        } for row in rows])
+
+    def _delete(self, conn, tombstones):
+        conn.executemany('DELETE FROM applications WHERE id = ?', [(row['id'],) for row in tombstones])
+        conn.executemany('INSERT OR REPLACE INTO tombstones (id, deleted_ts, deleted_at) VALUES (?, ?, ?)',
+                         [(row['id'], epoch(row['deleted_at']), row['deleted_at']) for row in tombstones])
+
+    # Sync
+
+    def start(self):
+        """Start the background sync thread for this process if it is not running"""
+        if self._syncer is not None and self._syncer.is_alive():
+            return
+        with self._sync_lock:
+            if self._syncer is None or not self._syncer.is_alive():
+                self._syncer = threading.Thread(target=self._sync_forever, name='application-mirror', daemon=True)
+                self._syncer.start()
+
+    def try_lock(self):
+        """Take the mirror's sync lock without blocking, returning the open lock file or None"""
+        lock_file = open(self.path + '.lock', 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except OSError:
+            lock_file.close()
+            return None
+
+    def _sync_forever(self):
+        # Wait until no other process is syncing this file; the lock is held for life
+        lock_file = self.try_lock()
+        while lock_file is None:
+            time.sleep(self.poll_interval * 5)
+            lock_file = self.try_lock()
+
+        backoff = self.poll_interval
+        while True:
+            try:
+                self.sync()
+                backoff = self.poll_interval
+            except Exception as e:
+                self._count('sync_errors')
+                logger.warning('Error syncing application mirror: %s', e)
+                backoff = min(backoff * 2, self.max_backoff)
+            time.sleep(backoff)
+
+    def sync(self):
+        """Bring the mirror up to date, rebuilding it if a gap is detected"""
+        state = self._state(self._connect())
+        if 'changes_after' not in state or time.time() - float(state.get('synced_at', 0)) > self.retention.total_seconds():
+            self.resync()
+            return
+
+        started = time.time()
+        self._poll(state)
+        self._count('polls')
+
+        if started - float(state.get('verified_at', 0)) >= self.verify_interval:
+            if self._verify():
+                self._set_state(verified_at=started, mismatches=0)
+            elif int(state.get('mismatches', 0)) >= 1:
+                # Still different after a full poll: something was missed
+                logger.warning('Application mirror counts disagree with Supabase, rebuilding it')
+                self.resync()
+                return
+            else:
+                # Could be a write committed between the two reads; check again next poll
+                self._set_state(mismatches=int(state.get('mismatches', 0)) + 1)
+        self._set_state(synced_at=started)
+
+    def resync(self):
+        """Replace the mirror with a full copy of visa_applications"""
+        started = time.time()
+        # Marks taken before copying; the first poll afterwards re-reads anything changed during the copy
+        changes_after = self._latest('visa_applications', 'updated_at')
+        deletes_after = self._latest('visa_applications_deleted', 'deleted_at')
+
+        client = client_manager.service_client()
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM applications_staging')
+        last_id = 0
+        while True:
+            rows = client.table('visa_applications').select('*').gt('id', last_id) \
+                .order('id').limit(self.page_size).execute().data
+            with conn:
+                self._upsert(conn, 'applications_staging', rows)
+            if len(rows) < self.page_size:
+                break
+            last_id = rows[-1]['id']
+
+        with conn:
+            conn.execute('DELETE FROM applications')
+            conn.execute('INSERT INTO applications SELECT * FROM applications_staging')
+            conn.execute('DELETE FROM applications_staging')
+            conn.execute('DELETE FROM tombstones')
+        self._set_state(changes_after=changes_after, deletes_after=deletes_after, mismatches=0)
+
+        self._poll(self._state(conn))
+        self._set_state(synced_at=started, verified_at=started)
+        self._count('resyncs')
+        logger.info('Rebuilt application mirror in %.1f s', time.time() - started)
+
+    def _poll(self, state):
+        client = client_manager.service_client()
+        conn = self._connect()
+        for table, column, apply, mark in (
+                ('visa_applications', 'updated_at', lambda rows: self._upsert(conn, 'applications', rows), 'changes_after'),
+                ('visa_applications_deleted', 'deleted_at', lambda rows: self._delete(conn, rows), 'deletes_after')):
+            latest = state[mark]
+            window_start = datetime.fromtimestamp(epoch(latest) - self.overlap, pytz.utc).isoformat()
+            cursor = None
+            while True:
+                query = client.table(table).select('*' if table == 'visa_applications' else 'id, deleted_at') \
+                    .gt(column, window_start)
+                if cursor:
+                    query = query.or_(f'{column}.gt."{cursor[0]}",and({column}.eq."{cursor[0]}",id.gt.{cursor[1]})')
+                rows = query.order(column).order('id').limit(self.page_size).execute().data
+                with conn:
+                    apply(rows)
+                for row in rows:
+                    if epoch(row[column]) > epoch(latest):
+                        latest = row[column]
+                if len(rows) < self.page_size:
+                    break
+                cursor = (rows[-1][column], rows[-1]['id'])
+            self._set_state(**{mark: latest})
+
+        # Keep local tombstones as long as the dashboard's delta refresh can ask for them
+        with conn:
+            conn.execute('DELETE FROM tombstones WHERE deleted_ts < ?', (time.time() - 7 * 86400,))
+
+    def _latest(self, table, column):
+        rows = client_manager.service_client().table(table).select(column).order(column, desc=True).limit(1).execute().data
+        return rows[0][column] if rows else datetime.fromtimestamp(0, pytz.utc).isoformat()
+
+    def _verify(self):
+        rows = client_manager.service_client().rpc('visa_application_status_counts', {}).execute().data
+        expected = {row['status']: row['count'] for row in rows if row['count']}
+        local = {row['status']: row['n'] for row in
+                 self._connect().execute('SELECT status, COUNT(*) AS n FROM applications GROUP BY status')}
+        return expected == local
+
+    def _set_state(self, **values):
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                             [(key, str(value)) for key, value in values.items()])
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        try:
+            conn = self._connect()
+            state = self._state(conn)
+            stats['rows'] = conn.execute('SELECT COUNT(*) FROM applications').fetchone()[0]
+            stats['lag_seconds'] = round(time.time() - float(state['synced_at']), 1) if 'synced_at' in state else None
+            stats['watermark'] = state.get('changes_after')
+        except sqlite3.Error as e:
+            stats['error'] = str(e)
+        return stats
+
+
+def create_mirror():
+    """Create the application mirror if APPLICATION_MIRROR_PATH is configured"""
+    path = os.getenv('APPLICATION_MIRROR_PATH')
+    if not path:
+        return None
+    if storage_backend != 'supabase':
+        # The mirror exists to avoid round trips to Supabase; a SQL store is read directly
+        logger.warning('APPLICATION_MIRROR_PATH is ignored with STORAGE_BACKEND=%s', storage_backend)
+        return None
+    if not client_manager.service_key:
+        raise RuntimeError('APPLICATION_MIRROR_PATH is set but SUPABASE_SERVICE_ROLE_KEY, which the sync reads with, is not')
+    return ApplicationMirror(
+        path,
+        poll_interval=float(os.getenv('APPLICATION_MIRROR_POLL_INTERVAL', '2')),
+        max_staleness=float(os.getenv('APPLICATION_MIRROR_MAX_STALENESS', '10'))
+    )
+
+
+# Shared by all requests handled by this worker process (None when mirroring is off)
+application_mirror = create_mirror()
+
+
+@click.group('mirror')
+def mirror_cli():
+    """Inspect and rebuild the local application mirror."""
+    if application_mirror is None:
+        raise click.ClickException('APPLICATION_MIRROR_PATH is not set')
+
+
+@mirror_cli.command('status')
+def mirror_status():
+    """Show the mirror's row count, watermark and lag."""
+    stats = application_mirror.stats()
+    click.echo(f"rows: {stats['rows']}  watermark: {stats['watermark']}  lag: {stats['lag_seconds']} s")
+
+
+@mirror_cli.command('resync')
+def mirror_resync():
+    """Rebuild the mirror from a full copy of visa_applications now."""
+    lock_file = application_mirror.try_lock()
+    if lock_file is None:
+        raise click.ClickException('A running server is already syncing this mirror')
+    try:
+        application_mirror.resync()
+        click.echo(f"Copied {application_mirror.stats()['rows']} application(s)")
+    finally:
+        lock_file.close()
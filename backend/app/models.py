@@ -1,28 +1,90 @@
-from . import db
-from flask_login import UserMixin
-from datetime import datetime
-
-class Admin(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(100), unique=True)
-    password = db.Column(db.String(100))
-    name = db.Column(db.String(100))
-
-class ContactSubmission(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100))
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(20))
-    subject = db.Column(db.String(200))
-    message = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class VisaSubmission(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    full_name = db.Column(db.String(100))
-    email = db.Column(db.String(100))
-    phone = db.Column(db.String(20))
-    visa_type = db.Column(db.String(50))
-    nationality = db.Column(db.String(50))
-    message = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+"""The visa_applications schema for the SQLAlchemy storage backend
+
+Mirrors the Supabase table and its migrations (columns, the unique
+submission_key, the dashboard and filter indexes, deletion tombstones and
+the analytics rollups), so a local SQLite or Postgres database answers the
+same queries. What Supabase does with triggers (bumping updated_at,
+recording tombstones, maintaining rollups) the SQLAlchemy store does in the
+same transaction as each write.
+"""
+from datetime import timezone
+
+from sqlalchemy import (BigInteger, Column, Date, DateTime, Index, Integer, MetaData, Table, Text,
+                        TypeDecorator)
+
+
+class UTCDateTime(TypeDecorator):
+    """TIMESTAMP WITH TIME ZONE that always comes back as an aware UTC datetime
+
+    SQLite has no time zones, so values are stored there as naive UTC.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return value.replace(tzinfo=None) if dialect.name == 'sqlite' else value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+metadata = MetaData()
+
+# BIGSERIAL on Postgres; SQLite only auto-increments an INTEGER primary key
+ID_TYPE = BigInteger().with_variant(Integer(), 'sqlite')
+
+visa_applications = Table(
+    'visa_applications', metadata,
+    Column('id', ID_TYPE, primary_key=True, autoincrement=True),
+    Column('name', Text, nullable=False),
+    Column('email', Text, nullable=False),
+    Column('phone', Text, nullable=False),
+    Column('country_applying_from', Text),
+    Column('passport_country', Text),
+    Column('destination', Text),
+    Column('travel_date', Date),
+    Column('return_date', Date),
+    Column('visa_type', Text),
+    Column('communication_method', Text),
+    Column('message', Text),
+    Column('form_type', Text),
+    Column('status', Text, server_default='new'),
+    Column('submitted_at', UTCDateTime),
+    Column('created_at', UTCDateTime),
+    Column('updated_at', UTCDateTime, nullable=False),
+    Column('submission_key', Text),
+    Index('idx_submitted_at_id', 'submitted_at', 'id'),
+    Index('idx_updated_at', 'updated_at'),
+    Index('idx_submission_key', 'submission_key', unique=True),
+    Index('idx_status_submitted_at', 'status', 'submitted_at', 'id'),
+    Index('idx_form_type_submitted_at', 'form_type', 'submitted_at', 'id'),
+    Index('idx_visa_type_submitted_at', 'visa_type', 'submitted_at', 'id'),
+    Index('idx_destination_submitted_at', 'destination', 'submitted_at', 'id'),
+    Index('idx_travel_date', 'travel_date'),
+)
+
+visa_applications_deleted = Table(
+    'visa_applications_deleted', metadata,
+    Column('id', ID_TYPE, primary_key=True, autoincrement=False),
+    Column('deleted_at', UTCDateTime, nullable=False),
+    Index('idx_deleted_at', 'deleted_at'),
+)
+
+visa_application_daily_counts = Table(
+    'visa_application_daily_counts', metadata,
+    Column('day', Date, primary_key=True),
+    Column('destination', Text, primary_key=True, server_default=''),
+    Column('visa_type', Text, primary_key=True, server_default=''),
+    Column('form_type', Text, primary_key=True, server_default=''),
+    Column('status', Text, primary_key=True, server_default=''),
+    Column('count', BigInteger, nullable=False, server_default='0'),
+)
+
+# Columns the daily rollups are split by, in primary key order
+ROLLUP_DIMENSIONS = ('destination', 'visa_type', 'form_type', 'status')
@@ -0,0 +1,250 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+from app.metrics import Counter, Gauge, registry
+
+try:
+    import redis
+except ImportError:  # optional, buckets are kept per process instead
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Rates are written as "<count>/<period>": up to `count` requests at once,
+# refilled at `count` per period
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+admission_rejected = registry.register(Counter(
+    'admission_rejected_total', 'Requests refused with 429 before any upstream work, by endpoint and reason',
+    ('endpoint', 'reason')))
+admission_in_flight = registry.register(Gauge(
+    'admission_in_flight', 'Requests currently admitted past a concurrency cap, by endpoint',
+    ('endpoint',)))
+
+
+def parse_rate(value):
+    """Parse "20/minute" into (tokens per second, burst), or None for "0" / empty"""
+    value = (value or '').strip().lower()
+    if not value or value in ('0', 'off', 'none'):
+        return None
+    count, _, period = value.partition('/')
+    seconds = PERIODS.get(period.strip() or 'second')
+    if seconds is None or not count.strip().isdigit() or int(count) <= 0:
+        raise ValueError(f'Invalid rate {value!r}, expected e.g. "20/minute"')
+    return int(count) / seconds, int(count)
+
+
+class MemoryBucketBackend:
+    """Token buckets held in this process, bounded to the most recently used keys
+
+    An evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """Spend `cost` tokens from the bucket, returning (allowed, seconds until allowed)"""
+        allowed, retry_after, _ = self.take_all([key], rate, burst, cost)
+        return allowed, retry_after
+
+    def take_all(self, keys, rate, burst, cost=1):
+        """Spend `cost` tokens from every bucket only if all of them have enough
+
+        Returns (allowed, seconds until allowed, index of the first key refused or None).
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            for key in keys:
+                tokens, updated_at = self._buckets.get(key, (burst, now))
+                levels[key] = min(burst, tokens + (now - updated_at) * rate)
+            waits = [(cost - tokens) / rate if tokens < cost else 0.0 for tokens in levels.values()]
+            retry_after = max(waits)
+            for key, tokens in levels.items():
+                self._buckets[key] = (tokens - cost if retry_after == 0.0 else tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        refused = next((index for index, wait in enumerate(waits) if wait > 0), None)
+        return retry_after == 0.0, retry_after, refused
+
+
+# Refill and spend atomically in Redis, on the server's clock so every worker agrees.
+# Tokens are only spent if every bucket in KEYS has enough.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local retry_after = 0
+local refused = -1
+for i, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    if tokens < cost then
+        retry_after = math.max(retry_after, (cost - tokens) / rate)
+        if refused < 0 then
+            refused = i - 1
+        end
+    end
+    levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if retry_after == 0 then
+        tokens = tokens - cost
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return {tostring(retry_after), refused}
+"""
+
+
+class RedisBucketBackend:
+    """Token buckets shared by every worker and instance through Redis
+
+    If Redis cannot be reached the bucket is taken from a per-process
+    fallback instead, so limits keep applying (per worker) during an outage.
+    """
+
+    def __init__(self, url, prefix='ratelimit:', timeout=0.05):
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = MemoryBucketBackend()
+
+    def take(self, key, rate, burst, cost=1):
+        allowed, retry_after, _ = self.take_all([key], rate, burst, cost)
+        return allowed, retry_after
+
+    def take_all(self, keys, rate, burst, cost=1):
+        try:
+            retry_after, refused = self._script(keys=[self.prefix + key for key in keys], args=[rate, burst, cost])
+        except redis.RedisError as e:
+            logger.warning('Rate limit backend unavailable, limiting per process: %s', e)
+            return self._fallback.take_all(keys, rate, burst, cost)
+        retry_after = float(retry_after)
+        return retry_after == 0.0, retry_after, (int(refused) if int(refused) >= 0 else None)
+
+
+def client_ip(trusted_proxies):
+    """The caller's address, read from X-Forwarded-For behind `trusted_proxies` proxies
+
+    Each trusted proxy appends the address it received the request from, so
+    the entry `trusted_proxies` from the right cannot be forged by the client.
+    """
+    if trusted_proxies > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if forwarded:
+            return forwarded[-min(trusted_proxies, len(forwarded))]
+    return request.remote_addr or 'unknown'
+
+
+def identity_keys(data):
+    """Bucket keys for the applicant's email and phone number, normalized"""
+    keys = []
+    email = (data.get('email') or data.get('emailAddress') or '').strip().lower()
+    if email:
+        keys.append(('email', email))
+    phone = re.sub(r'\D', '', data.get('phone') or data.get('phoneNumber') or '')
+    if phone:
+        keys.append(('phone', phone))
+    return keys
+
+
+class AdmissionControl:
+    """Concurrency cap plus token-bucket rate limits for a public endpoint
+
+    `admit` wraps the view: it sheds load once `max_concurrency` requests of
+    this kind are in flight in the worker, then spends a token from the
+    caller's IP bucket, both before the request body is read.
+    `check_identity` spends tokens from the applicant's email and phone
+    buckets once the form is parsed, before anything is written upstream;
+    neither bucket is charged unless both allow the request.
+    Refusals are answered with 429 and a Retry-After header.
+    """
+
+    def __init__(self, name, backend, ip_rate=None, identity_rate=None, max_concurrency=0, trusted_proxies=1):
+        self.name = name
+        self.backend = backend
+        self.ip_rate = ip_rate
+        self.identity_rate = identity_rate
+        self.max_concurrency = max_concurrency
+        self.trusted_proxies = trusted_proxies
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+
+    def admit(self, view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            if self._slots is not None and not self._slots.acquire(blocking=False):
+                return self.reject('concurrency', 1)
+            try:
+                admission_in_flight.inc(self.name)
+                if self.ip_rate is not None:
+                    allowed, retry_after = self.backend.take(f'{self.name}:ip:{client_ip(self.trusted_proxies)}', *self.ip_rate)
+                    if not allowed:
+                        return self.reject('ip', retry_after)
+                return view(*args, **kwargs)
+            finally:
+                admission_in_flight.dec(self.name)
+                if self._slots is not None:
+                    self._slots.release()
+        return decorated_function
+
+    def check_identity(self, data):
+        """Return a 429 response if the applicant's email or phone is over its limit, else None"""
+        keys = identity_keys(data)
+        if self.identity_rate is None or not keys:
+            return None
+        allowed, retry_after, refused = self.backend.take_all(
+            [f'{self.name}:{kind}:{value}' for kind, value in keys], *self.identity_rate)
+        if allowed:
+            return None
+        return self.reject(keys[refused][0], retry_after)
+
+    def reject(self, reason, retry_after):
+        admission_rejected.inc(self.name, reason)
+        response = jsonify({
+            'success': False,
+            'message': 'Too many submissions right now. Please try again shortly.'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+
+def create_backend():
+    """Redis-backed buckets when RATE_LIMIT_REDIS_URL is set, otherwise per-process buckets"""
+    url = os.getenv('RATE_LIMIT_REDIS_URL')
+    if not url:
+        return MemoryBucketBackend()
+    if redis is None:
+        raise RuntimeError('RATE_LIMIT_REDIS_URL is set but the redis package is not installed')
+    return RedisBucketBackend(url)
+
+
+# Public visa submissions (POST /api/visa), shared by all requests of this worker process
+submission_admission = AdmissionControl(
+    'submit',
+    create_backend(),
+    ip_rate=parse_rate(os.getenv('RATE_LIMIT_SUBMIT_IP', '10/minute')),
+    identity_rate=parse_rate(os.getenv('RATE_LIMIT_SUBMIT_IDENTITY', '5/hour')),
+    max_concurrency=int(os.getenv('SUBMIT_MAX_CONCURRENCY', '8')),
+    trusted_proxies=int(os.getenv('TRUSTED_PROXY_COUNT', '1'))
+)
@@ -0,0 +1,187 @@
+import logging
+import random
+import threading
+import time
+
+import httpx
+
+from app.metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+# Methods that read without side effects and can be sent again after a failure
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Gateway answers that mean the request did not reach (or finish in) PostgREST
+RETRYABLE_STATUSES = (502, 503, 504)
+
+upstream_retries = registry.register(Counter(
+    'supabase_retries_total', 'Supabase calls sent again after a failed attempt, by method',
+    ('method',)))
+upstream_short_circuited = registry.register(Counter(
+    'supabase_short_circuited_total', 'Supabase calls refused without being sent because the circuit was open'))
+circuit_open = registry.register(Gauge(
+    'supabase_circuit_open', '1 while the Supabase circuit breaker is open or half-open, else 0'))
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of sending a request while Supabase is considered down"""
+
+
+class CircuitBreaker:
+    """Stops calling Supabase for a while after repeated failures
+
+    After `failure_threshold` consecutive failed calls (transport errors,
+    timeouts and 5xx answers) the circuit opens and calls fail immediately
+    for `reset_timeout` seconds. Then one probe call is let through: if it
+    succeeds the circuit closes, otherwise it opens again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'short_circuited': 0}
+        circuit_open.set(value=0)
+
+    def allow(self):
+        """True if a call may be sent now"""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._stats['short_circuited'] += 1
+        upstream_short_circuited.inc()
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                logger.info('Supabase circuit closed')
+                self.state = self.CLOSED
+                self._probing = False
+                circuit_open.set(value=0)
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                logger.warning('Supabase circuit opened after %d failed call(s)', self._failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self._stats['opened'] += 1
+                circuit_open.set(value=1)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self.state
+            stats['consecutive_failures'] = self._failures
+            if self.state != self.CLOSED:
+                stats['retry_in_seconds'] = round(max(self.reset_timeout - (time.monotonic() - self._opened_at), 0), 1)
+        return stats
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """Wraps the pooled transport with deadlines, retries and the circuit breaker
+
+    Every request gets the read or write deadline as its connect/read/write/
+    pool timeouts, whichever is shorter than what the client asked for.
+    Idempotent reads that hit a transport error or a 502/503/504 are sent
+    again up to `retries` times with full-jitter exponential backoff, as long
+    as the next attempt still fits in the deadline; any request is retried if
+    the connection could not be opened, since nothing was sent. Requests are
+    refused with CircuitOpenError while the breaker is open.
+    """
+
+    def __init__(self, transport, breaker, read_timeout=5.0, write_timeout=10.0, connect_timeout=2.0,
+                 retries=2, backoff=0.1, max_backoff=1.0):
+        self.transport = transport
+        self.breaker = breaker
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def handle_request(self, request):
+        idempotent = request.method in IDEMPOTENT_METHODS
+        deadline = self.read_timeout if idempotent else self.write_timeout
+        give_up_at = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError('Supabase is unavailable (circuit open)', request=request)
+
+            remaining = give_up_at - time.monotonic()
+            request.extensions['timeout'] = self._timeouts(request, max(remaining, 0.001))
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                sent = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                if not self._retry(request, attempt, give_up_at, idempotent or not sent):
+                    raise
+                logger.info('Retrying Supabase %s %s after %s', request.method, request.url.path, type(e).__name__)
+            except Exception:
+                # Never leave a half-open probe outstanding
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if response.status_code not in RETRYABLE_STATUSES or \
+                        not self._retry(request, attempt, give_up_at, idempotent):
+                    return response
+                response.close()
+                logger.info('Retrying Supabase %s %s after HTTP %d', request.method, request.url.path,
+                            response.status_code)
+            attempt += 1
+
+    def _timeouts(self, request, remaining):
+        current = request.extensions.get('timeout') or {}
+
+        def limit(name, value):
+            asked = current.get(name)
+            return min(value, asked) if asked is not None else value
+
+        return {
+            'connect': limit('connect', min(self.connect_timeout, remaining)),
+            'read': limit('read', remaining),
+            'write': limit('write', remaining),
+            'pool': limit('pool', min(self.connect_timeout, remaining)),
+        }
+
+    def _retry(self, request, attempt, give_up_at, allowed):
+        """Sleep before the next attempt and return True, or False if the request must not be retried"""
+        if not allowed or attempt >= self.retries:
+            return False
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        # Leave the next attempt some time to actually run
+        if time.monotonic() + delay + self.backoff >= give_up_at:
+            return False
+        upstream_retries.inc(request.method)
+        time.sleep(delay)
+        return True
+
+    def close(self):
+        self.transport.close()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+# Key of the cached full application list
+LIST_KEY = 'applications'
+
+
+class CacheEntry:
+    """One cached read: the upstream data, its ETag and lazily rendered bodies"""
+
+    def __init__(self, data, etag, expires_at):
+        self.data = data
+        self.etag = etag
+        self.expires_at = expires_at
+        self._bodies = {}
+
+    def body(self, name, render):
+        # Renders are deterministic for the same data, so a race only costs a duplicate render
+        body = self._bodies.get(name)
+        if body is None:
+            body = self._bodies[name] = render(self.data)
+        return body
+
+
+class ResponseCache:
+    """Versioned in-memory LRU of application reads with ETag support
+
+    Every key has a version that the write handlers bump; an entry is only
+    served while its version is current and it is younger than `ttl`, which
+    bounds staleness from writes made by other worker processes. ETags are a
+    hash of the serialized data, so they stay valid across workers and
+    restarts and a refetch of unchanged data still answers 304.
+    """
+
+    def __init__(self, max_entries=1024, ttl=30, max_body_bytes=5 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_body_bytes = max_body_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+
+    def load(self, key, loader):
+        """Return the cached entry for `key`, calling `loader()` on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry
+            version = self._versions.get(key, 0)
+            self._stats['misses'] += 1
+
+        data = loader()
+        serialized = current_app.json.dumps(data).encode()
+        entry = CacheEntry(data, hashlib.blake2b(serialized, digest_size=12).hexdigest(), now + self.ttl)
+
+        with self._lock:
+            # Skip storing if a write invalidated the key while we were loading
+            if self._versions.get(key, 0) == version and len(serialized) <= self.max_body_bytes:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, app_id=None):
+        """Drop the cached list and, if given, one application after a write"""
+        keys = [LIST_KEY] + ([('application', app_id)] if app_id is not None else [])
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._entries.pop(key, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+    def conditional_response(self, entry, name, render, mimetype):
+        """304 if the client's If-None-Match already has this representation, else the cached body"""
+        etag = f'{entry.etag}-{name}'
+        # Weak comparison: compressed responses carry the same tag marked weak
+        if request.if_none_match.contains_weak(etag):
+            with self._lock:
+                self._stats['not_modified'] += 1
+            response = Response(status=304)
+        else:
+            response = Response(entry.body(name, render), mimetype=mimetype)
+        response.set_etag(etag)
+        # Browsers may keep a copy but must revalidate before reusing it
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def json_body(payload):
+    """Serialize a payload exactly as jsonify would"""
+    return current_app.json.dumps(payload) + '\n'
+
+
+# Shared by all requests handled by this worker process
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', '30'))
+)
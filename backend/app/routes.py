@@ -1,153 +1,362 @@
-from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for
-from app import supabase
-from datetime import datetime
+from flask import Blueprint, Response, g, request, jsonify, render_template, session, redirect, url_for
+from app import supabase, client_manager
+from app.clients import request_access_token, use_access_token
+from app.storage import store
+from app.events import broadcaster
+from app.stats import stats_cache
+from app.response_cache import LIST_KEY, json_body, response_cache
+from app.spool import submission_spool
+from app.submissions import SA_TIMEZONE, normalize_submission, record_new_application, validate_application
+from app.logs import log_payload
+from app.exports import EXPORT_FORMATS, export_chunks, parse_export_date
+from app.search import parse_filters
+from app.concurrency import upstream_pool
+from app.ratelimit import submission_admission
+from app.idempotency import request_idempotency_key, submission_dedup
+from app.sessions import session_auth
+from app.mirror import application_mirror
+from app.analytics import bucket_starts, load_trends, parse_analytics_args, trend_series
+from datetime import datetime, timedelta
 from functools import wraps
-from supabase import create_client, Client
-import os
+import csv
+import io
+import json
+import logging
 import pytz
 
 api_bp = Blueprint('api', __name__)
 dashboard_bp = Blueprint('dashboard', __name__)
 
-# Helper function to get authenticated Supabase client
-def get_auth_client():
-    """Create Supabase client with user's access token"""
-    access_token = session.get('access_token')
-    if not access_token:
-        return None
-    
-    supabase_url = os.getenv('SUPABASE_URL')
-    supabase_key = os.getenv('SUPABASE_KEY')
-    auth_client = create_client(supabase_url, supabase_key)
-    
-    try:
-        # Set the auth token for authenticated requests
-        auth_client.postgrest.auth(access_token)
-        return auth_client
-    except Exception as e:
-        # If token is invalid or expired, clear session
-        if 'JWT expired' in str(e) or 'invalid' in str(e).lower():
-            session.clear()
-        return None
+logger = logging.getLogger(__name__)
+
+# Columns rendered in the dashboard table and merged by its refresh script
+DASHBOARD_COLUMNS = ['id', 'name', 'email', 'phone', 'destination', 'travel_date', 'form_type', 'status', 'submitted_at', 'updated_at']
+
+# Bulk import settings
+BULK_CHUNK_SIZE = 500      # rows per multi-row insert
+BULK_MAX_ROWS = 100000     # rows accepted per import request
+
+# Bulk status/delete settings
+BULK_ACTION_MAX = 1000     # applications changed per bulk request
+BULK_ACTION_CHUNK = 200    # ids per upstream call, keeps the in.(...) filter short
+APPLICATION_STATUSES = ('new', 'in_progress', 'completed', 'cancelled')
+
+# Delta refresh settings
+DELTA_OVERLAP = timedelta(seconds=5)   # re-read window for rows committed out of order
+DELTA_RETENTION = timedelta(days=7)    # how long deletion tombstones are kept
+DELTA_LIMIT = 500                      # max changed rows returned per refresh
 
 # Authentication decorator
 def login_required(f):
+    """Require a valid admin session, verified locally and refreshed before it expires
+
+    Data calls made by the view then run as the admin, with the session's
+    (possibly just refreshed) access token.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'access_token' not in session:
+        if session_auth.authenticate() is None:
+            session.clear()
+            if request.blueprint == 'api':
+                return jsonify({'success': False, 'message': 'Session expired', 'expired': True}), 401
             return redirect(url_for('dashboard.login'))
-        return f(*args, **kwargs)
+        with use_access_token(session['access_token']):
+            return f(*args, **kwargs)
     return decorated_function
 
+# Helper functions for incremental refresh and pagination
+def fetch_latest_watermark():
+    """Return the most recent updated_at value, used as the client's starting cursor"""
+    return store.latest_watermark() or datetime.now(pytz.utc).isoformat()
+
+def make_page_cursor(application):
+    """Encode the sort key of the last row on a page for keyset pagination"""
+    return f"{application['submitted_at']}|{application['id']}"
+
+def parse_page_cursor(value):
+    """Decode a keyset cursor into (submitted_at, id), returning None if invalid"""
+    if not value or '|' not in value:
+        return None
+    submitted_at, _, last_id = value.rpartition('|')
+    if parse_watermark(submitted_at) is None or not last_id.isdigit():
+        return None
+    return submitted_at, int(last_id)
+
+def parse_watermark(value):
+    """Parse an ISO-8601 watermark sent by the dashboard, returning None if invalid"""
+    try:
+        watermark = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if watermark.tzinfo is None:
+        watermark = pytz.utc.localize(watermark)
+    return watermark
+
+def load_application(app_id):
+    """One application, from the local mirror when it is fresh and has the row, else from the store"""
+    application = application_mirror and application_mirror.get(app_id)
+    if application is None:
+        application = store.get(app_id)
+    return application
+
+def load_all_applications():
+    """Every application newest first, from the local mirror when it is fresh, else from the store"""
+    applications = application_mirror and application_mirror.all()
+    if applications is None:
+        applications = store.list_all()
+    return applications
+
 # API Routes
 @api_bp.route('/visa', methods=['POST'])
+@submission_admission.admit
 def submit_visa_application():
-    """Handle visa application submissions from both modals"""
+    """Handle visa application submissions from both modals
+    
+    Repeats of a submission (same Idempotency-Key, or the same applicant
+    within the dedup window) are answered with the first one's response
+    without touching the database.
+    """
     try:
         data = request.form.to_dict()
         
-        # Debug: Log incoming data
-        print("=" * 50)
-        print("INCOMING FORM DATA:")
-        for key, value in data.items():
-            print(f"  {key}: {value}")
-        print("=" * 50)
-        
-        # Map camelCase to snake_case for PostgreSQL
-        field_mapping = {
-            'countryApplyingFrom': 'country_applying_from',
-            'passportCountry': 'passport_country',
-            'travelDate': 'travel_date',
-            'returnDate': 'return_date',
-            'visaType': 'visa_type',
-            'communicationMethod': 'communication_method'
-        }
-        
-        # Define fields that exist in the database
-        allowed_fields = [
-            'name', 'email', 'phone', 'country_applying_from', 
-            'passport_country', 'destination', 'travel_date', 'return_date', 
-            'visa_type', 'communication_method', 'message'
-        ]
-        
-        # Convert camelCase to snake_case and filter
-        filtered_data = {}
-        for key, value in data.items():
-            # Convert key if it's in the mapping
-            db_key = field_mapping.get(key, key)
-            # Only include if it's an allowed field and value is not empty
-            if db_key in allowed_fields and value and value.strip():
-                filtered_data[db_key] = value
-        
-        # Debug: Log filtered data
-        print("FILTERED DATA FOR DATABASE:")
-        for key, value in filtered_data.items():
-            print(f"  {key}: {value}")
-        print("=" * 50)
-        
-        # Add timestamp and status using South African Time (SAST - UTC+2)
-        sa_timezone = pytz.timezone('Africa/Johannesburg')
-        sa_time = datetime.now(sa_timezone)
-        filtered_data['submitted_at'] = sa_time.isoformat()
-        filtered_data['status'] = 'new'
-        
-        # Determine form type from original data
-        if 'form_type' in data:
-            filtered_data['form_type'] = data['form_type']
-        elif 'communication_method' in filtered_data:
-            filtered_data['form_type'] = 'consultation' if 'message' in filtered_data else 'callback'
+        # Payloads are only logged when LOG_PAYLOADS is set, and redacted
+        log_payload(logger, 'Incoming submission', data)
+        
+        # Map form fields to columns and add timestamp, status and form type
+        filtered_data = normalize_submission(data)
+        log_payload(logger, 'Normalized submission', filtered_data)
+        
+        idempotency_key = request_idempotency_key(data)
+        dedup_keys = submission_dedup.keys_for(idempotency_key, filtered_data)
+        claim = submission_dedup.claim(dedup_keys)
+        if claim.replay is not None:
+            logger.info('Duplicate submission answered from cache', extra={'form_type': filtered_data.get('form_type')})
+            body, status = claim.replay
+            response = jsonify(body)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response, status
+    except Exception as e:
+        logger.exception('Error submitting application')
+        return jsonify({
+            'success': False,
+            'message': f'Error submitting application: {str(e)}'
+        }), 500
+    
+    try:
+        # Per-applicant limits, checked before anything is written
+        limited = submission_admission.check_identity(data)
+        if limited is not None:
+            return limited
+        
+        # The unique submission_key stops duplicates that reach another worker
+        filtered_data['submission_key'] = submission_dedup.submission_key(dedup_keys)
+        
+        # Write-behind mode: acknowledge once the submission is durably spooled
+        if submission_spool is not None:
+            submission_spool.append(filtered_data)
+            logger.info('Application queued', extra={'form_type': filtered_data.get('form_type')})
+            body = {
+                'success': True,
+                'message': 'Application submitted successfully. We will contact you soon!',
+                'id': None,
+                'queued': True
+            }
+            claim.complete((body, 202))
+            return jsonify(body), 202
+        
+        # Insert into the store; a duplicate key inserts nothing and returns no rows
+        inserted = store.insert([filtered_data], ignore_duplicates=True)
+        
+        if inserted:
+            # Update cached stats and push the new submission to connected dashboards
+            record_new_application(inserted[0])
+            app_id = inserted[0]['id']
+            logger.info('Application submitted', extra={
+                'application_id': app_id,
+                'form_type': inserted[0].get('form_type')
+            })
         else:
-            filtered_data['form_type'] = 'unknown'
-        
-        # Insert into Supabase
-        result = supabase.table('visa_applications').insert(filtered_data).execute()
+            app_id = store.find_by_submission_key(filtered_data['submission_key'])
+            logger.info('Duplicate submission ignored by the database', extra={'application_id': app_id})
         
-        return jsonify({
+        body = {
             'success': True,
             'message': 'Application submitted successfully. We will contact you soon!',
-            'id': result.data[0]['id'] if result.data else None
-        }), 200
+            'id': app_id
+        }
+        claim.complete((body, 200))
+        return jsonify(body), 200
         
     except Exception as e:
-        print(f"Error submitting application: {str(e)}")  # Log to terminal
+        logger.exception('Error submitting application')
         return jsonify({
             'success': False,
             'message': f'Error submitting application: {str(e)}'
         }), 500
-    except Exception as e:
+    finally:
+        # Lets a retry through if this attempt did not complete
+        claim.release()
+
+@api_bp.route('/visa/bulk', methods=['POST'])
+@login_required
+def bulk_import_applications():
+    """Import many applications from an NDJSON or CSV request body
+    
+    Rows go through the same field mapping and filtering as /api/visa, are
+    validated in a single pass and inserted in multi-row chunks. The response
+    reports the outcome of every row by its 1-based position in the upload.
+    """
+    content_type = request.mimetype
+    if content_type not in ('application/x-ndjson', 'application/jsonl', 'text/csv'):
         return jsonify({
             'success': False,
-            'message': f'Error submitting application: {str(e)}'
-        }), 500
+            'message': 'Send rows as application/x-ndjson or text/csv'
+        }), 415
+    
+    results = []
+    chunk = []
+    inserted = 0
+    
+    def flush_chunk():
+        nonlocal inserted
+        if not chunk:
+            return
+        try:
+            rows = store.insert([record for _, record in chunk])
+            for (row_number, _), application in zip(chunk, rows):
+                results.append({'row': row_number, 'success': True, 'id': application['id']})
+            inserted += len(rows)
+            if application_mirror is not None:
+                application_mirror.apply(rows)
+        except Exception as e:
+            for row_number, _ in chunk:
+                results.append({'row': row_number, 'success': False, 'errors': [str(e)]})
+        chunk.clear()
+    
+    parse_error = None
+    try:
+        for row_number, row in enumerate(read_bulk_rows(content_type), start=1):
+            if row_number > BULK_MAX_ROWS:
+                results.append({'row': row_number, 'success': False, 'errors': [f'Import is limited to {BULK_MAX_ROWS} rows']})
+                break
+            
+            if not isinstance(row, dict):
+                results.append({'row': row_number, 'success': False, 'errors': ['Row is not an object']})
+                continue
+            
+            # Same mapping and filtering as a single form submission
+            record = normalize_submission({key: str(value) for key, value in row.items() if value is not None})
+            errors = validate_application(record)
+            if errors:
+                results.append({'row': row_number, 'success': False, 'errors': errors})
+                continue
+            
+            chunk.append((row_number, record))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                flush_chunk()
+        flush_chunk()
+    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+        parse_error = f'Could not parse import: {str(e)}'
+        flush_chunk()
+    finally:
+        # One stats adjustment and one dashboard notification for the whole
+        # import, including rows inserted before a parse error
+        if inserted:
+            stats_cache.record_insert('new', inserted)
+            response_cache.invalidate()
+            broadcaster.publish('applications.imported', lambda: {'count': inserted, 'stats': stats_cache.get()})
+    
+    results.sort(key=lambda item: item['row'])
+    if parse_error:
+        return jsonify({
+            'success': False,
+            'message': parse_error,
+            'inserted': inserted,
+            'results': results
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'received': len(results),
+        'inserted': inserted,
+        'failed': len(results) - inserted,
+        'results': results
+    }), 200
+
+def read_bulk_rows(content_type):
+    """Yield rows from the request body without buffering the whole upload"""
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    if content_type == 'text/csv':
+        yield from csv.DictReader(stream)
+        return
+    
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
 
 @api_bp.route('/applications', methods=['GET'])
+@login_required
 def get_applications():
     """Get all applications (protected endpoint)"""
     try:
-        # In production, add proper authentication here
-        result = supabase.table('visa_applications').select('*').order('submitted_at', desc=True).execute()
+        entry = response_cache.load(LIST_KEY, load_all_applications)
         
-        return jsonify({
-            'success': True,
-            'data': result.data
-        }), 200
+        return response_cache.conditional_response(
+            entry, 'json', lambda data: json_body({'success': True, 'data': data}), 'application/json')
         
     except Exception as e:
+        logger.exception('Error handling %s', request.path)
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
 
+@api_bp.route('/applications/export', methods=['GET'])
+@login_required
+def export_applications():
+    """Stream applications as CSV or NDJSON, optionally filtered by status and submission date
+    
+    Rows are read in keyset pages and written out as they arrive, so memory
+    use does not grow with the size of the table.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+    
+    filters = {'statuses': [s for s in request.args.get('status', '').split(',') if s]}
+    for name, param in (('date_from', 'from'), ('date_to', 'to')):
+        if request.args.get(param):
+            filters[name] = parse_export_date(request.args[param])
+            if filters[name] is None:
+                return jsonify({'success': False, 'message': f'Invalid {param} date'}), 400
+    
+    # The body is streamed after the view returns; keep reading as the admin
+    access_token = request_access_token.get()
+    
+    def generate():
+        try:
+            with use_access_token(access_token):
+                yield from export_chunks(export_format, **filters)
+        except Exception:
+            # Headers are already sent; a truncated file is all we can signal
+            logger.exception('Error streaming export')
+    
+    filename = f"applications-{datetime.now(SA_TIMEZONE).strftime('%Y%m%d-%H%M')}.{export_format}"
+    return Response(generate(), mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'
+    })
+
 @api_bp.route('/applications/<int:app_id>', methods=['GET'])
+@login_required
 def get_application(app_id):
     """Get single application by ID"""
     try:
-        result = supabase.table('visa_applications').select('*').eq('id', app_id).single().execute()
+        entry = response_cache.load(('application', app_id), lambda: load_application(app_id))
         
-        return jsonify({
-            'success': True,
-            'data': result.data
-        }), 200
+        return response_cache.conditional_response(
+            entry, 'json', lambda data: json_body({'success': True, 'data': data}), 'application/json')
         
     except Exception as e:
         return jsonify({
@@ -166,8 +375,19 @@ def update_application_status(app_id):
         if not new_status:
             return jsonify({'success': False, 'message': 'Status is required'}), 400
         
-        # Use service key to update (bypasses RLS)
-        result = supabase.table('visa_applications').update({'status': new_status}).eq('id', app_id).execute()
+        # Previous status is needed to keep the cached stats exact
+        previous = store.statuses([app_id])
+        
+        updated = store.update_status([app_id], new_status)
+        response_cache.invalidate(app_id)
+        
+        if updated:
+            application = updated[0]
+            if application_mirror is not None:
+                application_mirror.apply(updated)
+            if app_id in previous:
+                stats_cache.record_status_change(previous[app_id], application['status'])
+            broadcaster.publish('application.updated', lambda: {'application': application, 'stats': stats_cache.get()})
         
         return jsonify({
             'success': True,
@@ -175,6 +395,7 @@ def update_application_status(app_id):
         }), 200
         
     except Exception as e:
+        logger.exception('Error handling %s', request.path)
         return jsonify({
             'success': False,
             'message': str(e)
@@ -185,8 +406,14 @@ def update_application_status(app_id):
 def delete_application(app_id):
     """Delete an application (protected endpoint)"""
     try:
-        # Use service key to delete (bypasses RLS)
-        result = supabase.table('visa_applications').delete().eq('id', app_id).execute()
+        deleted = store.delete([app_id])
+        response_cache.invalidate(app_id)
+        
+        if deleted:
+            if application_mirror is not None:
+                application_mirror.remove([app_id])
+            stats_cache.record_delete(deleted[0].get('status'))
+            broadcaster.publish('application.deleted', lambda: {'id': app_id, 'stats': stats_cache.get()})
         
         return jsonify({
             'success': True,
@@ -194,11 +421,185 @@ def delete_application(app_id):
         }), 200
         
     except Exception as e:
+        logger.exception('Error handling %s', request.path)
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
 
+def select_bulk_targets(data):
+    """Resolve a bulk request's `ids` list or dashboard `filter` to (requested ids, {id: current status})
+    
+    Raises ValueError with a message for the client if the request is invalid.
+    """
+    ids = data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError('ids must be a list of integers')
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > BULK_ACTION_MAX:
+            raise ValueError(f'At most {BULK_ACTION_MAX} applications can be changed at once')
+        chunks = [ids[start:start + BULK_ACTION_CHUNK] for start in range(0, len(ids), BULK_ACTION_CHUNK)]
+        current = {}
+        for statuses in upstream_pool.gather(*(lambda chunk=chunk: store.statuses(chunk) for chunk in chunks)):
+            current.update(statuses)
+        return ids, current
+    
+    if isinstance(data.get('filter'), dict):
+        filters = parse_filters({key: str(value) for key, value in data['filter'].items()})
+        if not filters:
+            raise ValueError('filter must include at least one search or filter value')
+        # Resolve the filter to ids once, so the report covers exactly the rows changed
+        rows = store.find(['id', 'status'], filters, BULK_ACTION_MAX + 1)
+        if len(rows) > BULK_ACTION_MAX:
+            raise ValueError(f'filter matches more than {BULK_ACTION_MAX} applications; narrow it down')
+        return [row['id'] for row in rows], {row['id']: row['status'] for row in rows}
+    
+    raise ValueError('Send ids or filter')
+
+def run_bulk_action(ids, action):
+    """Run `action(chunk_of_ids)` over ids in chunks, returning ({id: returned row}, {id: error})"""
+    done, errors = {}, {}
+    for start in range(0, len(ids), BULK_ACTION_CHUNK):
+        chunk = ids[start:start + BULK_ACTION_CHUNK]
+        try:
+            for row in action(chunk):
+                done[row['id']] = row
+        except Exception as e:
+            logger.exception('Error in bulk action on %d application(s)', len(chunk))
+            errors.update((app_id, str(e)) for app_id in chunk)
+    return done, errors
+
+def bulk_report(ids, done, errors):
+    results = []
+    for app_id in ids:
+        if app_id in done:
+            results.append({'id': app_id, 'success': True})
+        else:
+            results.append({'id': app_id, 'success': False, 'error': errors.get(app_id, 'Application not found')})
+    return results
+
+@api_bp.route('/applications/bulk/status', methods=['POST'])
+@login_required
+def bulk_update_status():
+    """Set one status on many applications, given `ids` or a dashboard `filter`
+    
+    The change is applied with one `in` update per chunk of ids and the
+    response reports the outcome for every requested id.
+    """
+    data = request.get_json(silent=True) or {}
+    new_status = data.get('status')
+    if new_status not in APPLICATION_STATUSES:
+        return jsonify({'success': False, 'message': f"status must be one of {', '.join(APPLICATION_STATUSES)}"}), 400
+    
+    try:
+        ids, current = select_bulk_targets(data)
+        
+        done, errors = run_bulk_action([i for i in ids if i in current],
+                                       lambda chunk: store.update_status(chunk, new_status))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.exception('Error handling %s', request.path)
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    if done and application_mirror is not None:
+        application_mirror.apply(list(done.values()))
+    for app_id in done:
+        stats_cache.record_status_change(current[app_id], new_status)
+        response_cache.invalidate(app_id)
+    if done:
+        # One notification for the batch; dashboards fetch the changed rows in one refresh
+        broadcaster.publish('applications.bulk_updated', lambda: {'ids': list(done), 'status': new_status, 'stats': stats_cache.get()})
+    
+    return jsonify({
+        'success': True,
+        'requested': len(ids),
+        'updated': len(done),
+        'failed': len(ids) - len(done),
+        'results': bulk_report(ids, done, errors)
+    }), 200
+
+@api_bp.route('/applications/bulk/delete', methods=['POST'])
+@login_required
+def bulk_delete_applications():
+    """Delete many applications, given `ids` or a dashboard `filter`, reporting each id"""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        ids, current = select_bulk_targets(data)
+        
+        done, errors = run_bulk_action([i for i in ids if i in current], store.delete)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.exception('Error handling %s', request.path)
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    if done and application_mirror is not None:
+        application_mirror.remove(list(done))
+    for app_id, row in done.items():
+        stats_cache.record_delete(row.get('status'))
+        response_cache.invalidate(app_id)
+    if done:
+        broadcaster.publish('applications.bulk_deleted', lambda: {'ids': list(done), 'stats': stats_cache.get()})
+    
+    return jsonify({
+        'success': True,
+        'requested': len(ids),
+        'deleted': len(done),
+        'failed': len(ids) - len(done),
+        'results': bulk_report(ids, done, errors)
+    }), 200
+
+@api_bp.route('/analytics', methods=['GET'])
+@login_required
+def get_analytics():
+    """Submission counts per day, week or month, optionally split by one column
+    
+    Reads the trigger-maintained daily rollups, so the cost depends on the
+    number of days requested rather than the number of applications.
+    """
+    try:
+        date_from, date_to, granularity, group_by = parse_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    try:
+        buckets = bucket_starts(date_from, date_to, granularity)
+        series = trend_series(load_trends(date_from, date_to, granularity, group_by), buckets)
+    except Exception as e:
+        logger.exception('Error handling %s', request.path)
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'granularity': granularity,
+        'group_by': group_by,
+        'buckets': [start.isoformat() for start in buckets],
+        'total': sum(item['total'] for item in series),
+        'series': series
+    }), 200
+
+# Health Routes
+@dashboard_bp.route('/health')
+def health():
+    """Health check with Supabase connection pool and circuit breaker statistics"""
+    circuit = client_manager.breaker.stats()
+    return jsonify({
+        # Still 200 while degraded: the app keeps serving what it can without Supabase
+        'status': 'healthy' if circuit['state'] == 'closed' else 'degraded',
+        'supabase_pool': client_manager.stats(),
+        'supabase_circuit': circuit,
+        'storage': store.name,
+        'response_cache': response_cache.stats(),
+        'submission_dedup': submission_dedup.stats(),
+        'sessions': session_auth.stats(),
+        'mirror': application_mirror.stats() if application_mirror is not None else None
+    }), 200
+
 # Dashboard Routes
 @dashboard_bp.route('/admin/signup', methods=['GET', 'POST'])
 def signup():
@@ -241,7 +642,7 @@ def signup():
             }), 400
     
     # Check if already logged in
-    if 'access_token' in session:
+    if session_auth.authenticate() is not None:
         return redirect(url_for('dashboard.index'))
     
     return render_template('admin/signup.html')
@@ -278,7 +679,7 @@ def login():
             }), 401
     
     # Check if already logged in
-    if 'access_token' in session:
+    if session_auth.authenticate() is not None:
         return redirect(url_for('dashboard.index'))
     
     return render_template('admin/login.html')
@@ -303,36 +704,42 @@ def index():
     """Dashboard home page showing all applications with pagination"""
     try:
         # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = 10
         
-        # Fetch all applications for stats (using service key bypasses RLS)
-        all_result = supabase.table('visa_applications').select('*').order('submitted_at', desc=True).execute()
-        all_applications = all_result.data
-        
-        # Calculate stats
-        total = len(all_applications)
-        new_count = len([a for a in all_applications if a.get('status') == 'new'])
-        in_progress = len([a for a in all_applications if a.get('status') == 'in_progress'])
-        completed = len([a for a in all_applications if a.get('status') == 'completed'])
-        
-        stats = {
-            'total': total,
-            'new': new_count,
-            'in_progress': in_progress,
-            'completed': completed
-        }
-        
-        # Paginate applications
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        applications = all_applications[start_idx:end_idx]
+        # Search and filters are evaluated by the database; the match count comes back with the page
+        filters = parse_filters(request.args)
+        offset = (page - 1) * per_page
+        
+        # Keyset cursors are only used unfiltered, where the total comes from the stats cache
+        after = None if filters else parse_page_cursor(request.args.get('after'))
+        
+        # Unfiltered pages come from the local mirror while it is fresh; search
+        # and filters need the database's indexes
+        mirrored = None
+        if application_mirror is not None and not filters:
+            mirrored = application_mirror.page(DASHBOARD_COLUMNS, per_page, offset=offset, after=after)
+        if mirrored is not None:
+            (applications, watermark), stats = mirrored, stats_cache.get()
+            watermark = watermark or fetch_latest_watermark()
+            matched = None
+        else:
+            # The page, the refresh watermark and the status counts (served from the
+            # process-level cache once loaded) are independent, so fetch them together
+            (applications, matched), watermark, stats = upstream_pool.gather(
+                lambda: store.page(DASHBOARD_COLUMNS, filters, per_page, offset, after, count=bool(filters)),
+                fetch_latest_watermark, stats_cache.get)
+        total = matched if filters else stats['total']
         
         # Calculate pagination info
         total_pages = (total + per_page - 1) // per_page
         has_prev = page > 1
         has_next = page < total_pages
         
+        # Only the page links the template can show: first, last and a window around the current page
+        pages = sorted({1, total_pages} | set(range(page - 3, page + 4)))
+        pages = [p for p in pages if 1 <= p <= total_pages]
+        
         pagination = {
             'page': page,
             'per_page': per_page,
@@ -342,10 +749,12 @@ def index():
             'has_next': has_next,
             'prev_page': page - 1 if has_prev else None,
             'next_page': page + 1 if has_next else None,
-            'pages': list(range(1, total_pages + 1))
+            'next_cursor': make_page_cursor(applications[-1]) if has_next and applications and not filters else None,
+            'pages': pages
         }
         
-        return render_template('admin/dashboard.html', applications=applications, stats=stats, pagination=pagination)
+        return render_template('admin/dashboard.html', applications=applications, stats=stats, pagination=pagination,
+                               watermark=watermark, filters=filters)
         
     except Exception as e:
         # Check if JWT expired error
@@ -354,6 +763,8 @@ def index():
             session.clear()
             return redirect(url_for('dashboard.login'))
         
+        logger.exception('Error loading dashboard')
+        
         # Return empty data with pagination for error case
         empty_pagination = {
             'page': 1,
@@ -364,51 +775,58 @@ def index():
             'has_next': False,
             'prev_page': None,
             'next_page': None,
+            'next_cursor': None,
             'pages': []
         }
-        return render_template('admin/dashboard.html', applications=[], stats={}, error=error_msg, pagination=empty_pagination)
+        return render_template('admin/dashboard.html', applications=[], stats={}, error=error_msg, pagination=empty_pagination,
+                               filters=parse_filters(request.args))
+
+@dashboard_bp.route('/admin/events')
+@login_required
+def application_events():
+    """Server-sent events stream of new, updated and deleted applications"""
+    subscription = broadcaster.subscribe()
+    # End the stream when the session's token expires so it cannot outlive the session
+    expires_at = g.auth_claims['exp']
+    return Response(broadcaster.stream(subscription, expires_at), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @dashboard_bp.route('/admin/application/<int:app_id>')
 @login_required
 def view_application(app_id):
     """View single application details"""
     try:
-        # Fetch application from Supabase (using service key bypasses RLS)
-        result = supabase.table('visa_applications').select('*').eq('id', app_id).single().execute()
-        application = result.data
+        # Fetch application from the mirror or Supabase (using service key bypasses RLS), shared with the JSON API's cache
+        entry = response_cache.load(('application', app_id), lambda: load_application(app_id))
         
-        return render_template('admin/application_detail.html', application=application)
+        return response_cache.conditional_response(
+            entry, 'html', lambda data: render_template('admin/application_detail.html', application=data), 'text/html')
         
     except Exception as e:
         return f"Error loading application: {str(e)}", 404
 
 @api_bp.route('/applications/refresh', methods=['GET'])
+@login_required
 def refresh_applications():
-    """API endpoint to fetch fresh dashboard data for real-time updates"""
+    """API endpoint to fetch fresh dashboard data for real-time updates
+    
+    When called with ?since=<watermark> only the rows inserted, updated or
+    deleted after that watermark are returned. Without it the full list is
+    returned for older clients.
+    """
     try:
-        # Check for session authentication
-        if 'access_token' not in session:
-            return jsonify({'success': False, 'message': 'Unauthorized', 'expired': True}), 401
-        
-        # Fetch all applications (using service key bypasses RLS)
-        result = supabase.table('visa_applications').select('*').order('submitted_at', desc=True).execute()
-        applications = result.data
+        since_param = request.args.get('since')
+        if since_param:
+            return refresh_applications_delta(since_param)
         
-        # Calculate stats
-        total = len(applications)
-        new = len([app for app in applications if app.get('status') == 'new'])
-        in_progress = len([app for app in applications if app.get('status') == 'in_progress'])
-        completed = len([app for app in applications if app.get('status') == 'completed'])
+        applications = load_all_applications()
         
         return jsonify({
             'success': True,
             'applications': applications,
-            'stats': {
-                'total': total,
-                'new': new,
-                'in_progress': in_progress,
-                'completed': completed
-            }
+            'stats': stats_cache.get()
         }), 200
         
     except Exception as e:
@@ -416,4 +834,45 @@ def refresh_applications():
         # Check if JWT expired
         if 'JWT expired' in error_msg or 'PGRST303' in error_msg:
             return jsonify({'success': False, 'message': 'Session expired', 'expired': True}), 401
+        logger.exception('Error refreshing applications')
         return jsonify({'success': False, 'message': error_msg}), 500
+
+def refresh_applications_delta(since_param):
+    """Return only the applications changed or deleted since the given watermark"""
+    since = parse_watermark(since_param)
+    if since is None:
+        return jsonify({'success': False, 'message': 'Invalid since watermark'}), 400
+    
+    # Tombstones older than the retention window are pruned, so the client must reload
+    if datetime.now(pytz.utc) - since > DELTA_RETENTION:
+        return jsonify({'success': True, 'reset': True}), 200
+    
+    # Re-read a small overlap so rows committed slightly out of order are not missed;
+    # the dashboard merges rows by id, so repeats are harmless
+    window_start = since - DELTA_OVERLAP
+    
+    mirrored = application_mirror and application_mirror.changes(window_start, DELTA_LIMIT, DASHBOARD_COLUMNS)
+    changed, deleted = mirrored or store.changes(window_start, DELTA_LIMIT, DASHBOARD_COLUMNS)
+    
+    # Too many changes to merge client-side, ask for a full reload instead
+    if len(changed) >= DELTA_LIMIT or len(deleted) >= DELTA_LIMIT:
+        return jsonify({'success': True, 'reset': True}), 200
+    
+    watermark = since
+    for timestamp in [row['updated_at'] for row in changed] + [row['deleted_at'] for row in deleted]:
+        parsed = parse_watermark(timestamp)
+        if parsed and parsed > watermark:
+            watermark = parsed
+    
+    response = {
+        'success': True,
+        'applications': changed,
+        'deleted': [row['id'] for row in deleted],
+        'watermark': watermark.isoformat()
+    }
+    
+    # Stats only change when something new happened since the last refresh
+    if watermark > since:
+        response['stats'] = stats_cache.get()
+    
+    return jsonify(response), 200
@@ -0,0 +1,65 @@
+import re
+from datetime import date
+
+from app.exports import date_bound, parse_export_date
+
+# Filters offered by the dashboard, in form order
+EQUALITY_FILTERS = ['status', 'form_type', 'visa_type', 'destination']
+DATE_FILTERS = ['submitted_from', 'submitted_to', 'travel_from', 'travel_to']
+
+# Columns matched by the free-text search, each with a trigram index
+SEARCH_COLUMNS = ['name', 'email', 'phone']
+
+# Trigram indexes need at least three characters to narrow the scan
+SEARCH_MIN_LENGTH = 3
+
+# Characters with a meaning in PostgREST logic trees or LIKE patterns
+_SEARCH_STRIP = re.compile(r'[*,()"\\%]')
+
+
+def parse_filters(args):
+    """Return the dashboard filters present and valid in the query string, as strings
+
+    The result doubles as the query arguments for pagination links.
+    """
+    filters = {}
+
+    q = ' '.join(_SEARCH_STRIP.sub(' ', args.get('q', '')).split())
+    if len(q) >= SEARCH_MIN_LENGTH:
+        filters['q'] = q
+
+    for name in EQUALITY_FILTERS:
+        value = args.get(name, '').strip()
+        if value:
+            filters[name] = value
+
+    for name in DATE_FILTERS:
+        value = args.get(name, '').strip()
+        if isinstance(parse_export_date(value), date):
+            filters[name] = value
+
+    return filters
+
+
+def apply_filters(query, filters):
+    """Add the filters to a visa_applications query so Postgres evaluates them"""
+    if 'q' in filters:
+        pattern = f'"*{filters["q"]}*"'
+        query = query.or_(','.join(f'{column}.ilike.{pattern}' for column in SEARCH_COLUMNS))
+
+    for name in EQUALITY_FILTERS:
+        if name in filters:
+            query = query.eq(name, filters[name])
+
+    if 'submitted_from' in filters:
+        query = query.gte('submitted_at', date_bound(parse_export_date(filters['submitted_from'])).isoformat())
+    if 'submitted_to' in filters:
+        query = query.lt('submitted_at', date_bound(parse_export_date(filters['submitted_to']), end=True).isoformat())
+
+    # travel_date is a DATE column, so plain dates compare directly
+    if 'travel_from' in filters:
+        query = query.gte('travel_date', parse_export_date(filters['travel_from']).isoformat()[:10])
+    if 'travel_to' in filters:
+        query = query.lte('travel_date', parse_export_date(filters['travel_to']).isoformat()[:10])
+
+    return query
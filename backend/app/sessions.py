@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, session
+
+from app import client_manager
+from app.tokens import decode_claims, verify_token
+
+logger = logging.getLogger(__name__)
+
+
+class SessionAuth:
+    """Checks admin sessions locally and refreshes their tokens before they expire
+
+    With SUPABASE_JWT_SECRET set, the session's access token is verified
+    (HS256 signature, expiry) without calling Supabase; without it each new
+    token is checked once with Supabase Auth. Dashboard reads may be served
+    from the local mirror or response cache without a PostgREST call, so a
+    token is never trusted on its expiry alone. Parsed claims are cached per
+    token until the token expires.
+
+    Once a token is within `refresh_margin` seconds of expiry it is swapped
+    for a new one using the session's refresh token. Requests of the same
+    session that arrive together share one refresh: the result is kept for
+    `refresh_reuse` seconds under the old refresh token. Refreshes are
+    serialized per refresh token, so one slow call to Supabase Auth only
+    holds up requests of its own session.
+    """
+
+    def __init__(self, jwt_secret=None, refresh_margin=300, refresh_reuse=30, max_entries=1024):
+        self.jwt_secret = jwt_secret
+        self.refresh_margin = refresh_margin
+        self.refresh_reuse = refresh_reuse
+        self.max_entries = max_entries
+        self._claims = OrderedDict()
+        self._refreshed = OrderedDict()
+        self._lock = threading.Lock()
+        # refresh token -> [lock, number of requests using it]
+        self._refresh_locks = {}
+        self._stats = {'verified': 0, 'cache_hits': 0, 'rejected': 0, 'refreshed': 0, 'refresh_failures': 0}
+
+    def claims_for(self, token):
+        """Return the token's claims if it is valid and unexpired, else None"""
+        now = time.time()
+        with self._lock:
+            claims = self._claims.get(token)
+            if claims is not None:
+                if claims['exp'] > now:
+                    self._claims.move_to_end(token)
+                    self._stats['cache_hits'] += 1
+                    return claims
+                del self._claims[token]
+
+        if self.jwt_secret:
+            claims = verify_token(token, self.jwt_secret)
+        else:
+            claims = decode_claims(token)
+            if claims is not None and not (isinstance(claims.get('exp'), (int, float)) and claims['exp'] > now):
+                claims = None
+            if claims is not None:
+                try:
+                    client_manager.get_user(token)
+                except Exception as e:
+                    logger.warning('Supabase Auth did not accept the admin session token: %s', e)
+                    claims = None
+
+        with self._lock:
+            if claims is None:
+                self._stats['rejected'] += 1
+                return None
+            self._stats['verified'] += 1
+            self._claims[token] = claims
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+        return claims
+
+    def authenticate(self):
+        """Return the current admin's claims, refreshing the session's tokens if due, or None
+
+        The claims are also left on `g.auth_claims` for the request.
+        """
+        access_token = session.get('access_token')
+        if not access_token:
+            return None
+
+        claims = self.claims_for(access_token)
+        if claims is None or claims['exp'] - time.time() < self.refresh_margin:
+            refreshed = self.refresh(session.get('refresh_token'))
+            if refreshed is not None:
+                session['access_token'] = refreshed['access_token']
+                session['refresh_token'] = refreshed['refresh_token']
+                claims = self.claims_for(refreshed['access_token'])
+            # A failed refresh is fine while the current token is still valid
+
+        g.auth_claims = claims
+        return claims
+
+    def refresh(self, refresh_token):
+        """Exchange the refresh token for new tokens, or return None if that is not possible"""
+        if not refresh_token:
+            return None
+        with self._lock:
+            entry = self._refresh_locks.setdefault(refresh_token, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                return self._refresh(refresh_token)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._refresh_locks[refresh_token]
+
+    def _refresh(self, refresh_token):
+        with self._lock:
+            cached = self._refreshed.get(refresh_token)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+
+        try:
+            response = client_manager.refresh_session(refresh_token)
+            tokens = {'access_token': response['access_token'], 'refresh_token': response['refresh_token']}
+        except Exception as e:
+            logger.warning('Could not refresh admin session: %s', e)
+            with self._lock:
+                self._stats['refresh_failures'] += 1
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            self._refreshed[refresh_token] = (tokens, now + self.refresh_reuse)
+            while self._refreshed and next(iter(self._refreshed.values()))[1] <= now:
+                self._refreshed.popitem(last=False)
+            self._stats['refreshed'] += 1
+        logger.info('Refreshed admin session')
+        return tokens
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_claims'] = len(self._claims)
+        return stats
+
+
+# Shared by all requests handled by this worker process
+session_auth = SessionAuth(
+    jwt_secret=os.getenv('SUPABASE_JWT_SECRET') or None,
+    refresh_margin=int(os.getenv('SESSION_REFRESH_MARGIN', '300'))
+)
@@ -0,0 +1,286 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import click
+import httpx
+from postgrest.exceptions import APIError
+
+try:
+    from sqlalchemy.exc import DataError, IntegrityError, ProgrammingError
+except ImportError:  # only needed with STORAGE_BACKEND=sqlalchemy
+    DataError = IntegrityError = ProgrammingError = None
+
+from app.storage import store
+from app.submissions import record_new_application
+
+logger = logging.getLogger(__name__)
+
+# Postgres/PostgREST error classes that will fail the same way on every retry
+PERMANENT_ERROR_PREFIXES = ('22', '23', '42', 'PGRST1', 'PGRST2')
+
+
+class SubmissionSpool:
+    """Durable write-behind queue for public visa submissions
+
+    Submissions are appended to a local SQLite file and acknowledged as soon
+    as the write is on disk. A background flusher drains the spool into
+    `visa_applications` in submission order, in batches, retrying with
+    backoff while the database is slow or down. Each row carries a
+    `submission_key` so a batch that is retried after its response was lost
+    is not inserted twice.
+
+    Every worker process can append; only the process holding the spool's
+    lock file runs the flusher, which keeps inserts in order.
+    """
+
+    def __init__(self, path, batch_size=100, poll_interval=1.0, max_backoff=60.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+        self._init_db()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not cross a fork; each worker opens its own
+        self._local = threading.local()
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS spool (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    submission_key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    enqueued_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_spool_state_seq ON spool(state, seq)')
+
+    def append(self, record):
+        """Durably store a normalized submission and return its submission key
+
+        A submission whose key is already spooled is not stored again.
+        """
+        record = dict(record)
+        record.setdefault('submission_key', str(uuid.uuid4()))
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO spool (submission_key, payload, enqueued_at) VALUES (?, ?, ?)',
+                (record['submission_key'], json.dumps(record), time.time())
+            )
+        self.start()
+        self._wakeup.set()
+        return record['submission_key']
+
+    def pending(self, limit=None, state='pending'):
+        query = 'SELECT * FROM spool WHERE state = ? ORDER BY seq'
+        params = [state]
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [dict(row) for row in self._connect().execute(query, params)]
+
+    def counts(self):
+        rows = self._connect().execute('SELECT state, COUNT(*) AS n, MIN(enqueued_at) AS oldest FROM spool GROUP BY state')
+        return {row['state']: {'count': row['n'], 'oldest_enqueued_at': row['oldest']} for row in rows}
+
+    def requeue_dead(self):
+        """Move dead rows back to pending so the flusher retries them"""
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE spool SET state = 'pending', attempts = 0 WHERE state = 'dead'")
+        self._wakeup.set()
+        return cursor.rowcount
+
+    def start(self):
+        """Start the background flusher thread for this process if it is not running"""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._flush_lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_forever, name='submission-spool', daemon=True)
+                self._flusher.start()
+
+    def try_lock(self):
+        """Take the spool's flush lock without blocking, returning the open lock file or None"""
+        lock_file = open(self.path + '.lock', 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except OSError:
+            lock_file.close()
+            return None
+
+    def _flush_forever(self):
+        # Wait until no other process is flushing this spool; the lock is held for life
+        lock_file = self.try_lock()
+        while lock_file is None:
+            time.sleep(self.poll_interval * 5)
+            lock_file = self.try_lock()
+
+        backoff = self.poll_interval
+        while True:
+            try:
+                flushed, failed = self.flush()
+            except Exception:
+                logger.exception('Error flushing submission spool')
+                flushed, failed = 0, True
+
+            if failed:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            elif not flushed:
+                backoff = self.poll_interval
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+            else:
+                backoff = self.poll_interval
+
+    def flush(self):
+        """Insert the oldest pending batch, returning (rows flushed, whether a retry is needed)"""
+        batch = self.pending(limit=self.batch_size)
+        if not batch:
+            return 0, False
+
+        try:
+            self._insert(batch)
+            return len(batch), False
+        except Exception as e:
+            if len(batch) == 1 or not is_permanent_error(e):
+                self._record_failure(batch, e)
+                return 0, not is_permanent_error(e)
+
+        # A row in the batch is rejected by the database; insert one at a time,
+        # in order, so the bad row is isolated without reordering the rest
+        flushed = 0
+        for row in batch:
+            try:
+                self._insert([row])
+                flushed += 1
+            except Exception as e:
+                self._record_failure([row], e)
+                if not is_permanent_error(e):
+                    return flushed, True
+        return flushed, False
+
+    def _insert(self, rows):
+        records = [json.loads(row['payload']) for row in rows]
+        inserted = store.insert(records, ignore_duplicates=True)
+
+        with self._connect() as conn:
+            conn.executemany('DELETE FROM spool WHERE seq = ?', [(row['seq'],) for row in rows])
+
+        # Rows skipped as duplicates of an earlier attempt are not returned
+        for application in inserted:
+            record_new_application(application)
+
+    def _record_failure(self, rows, error):
+        # Transient failures stay pending and are retried indefinitely;
+        # rows the database rejects are parked as dead for inspection
+        state = 'dead' if is_permanent_error(error) else 'pending'
+        with self._connect() as conn:
+            conn.executemany(
+                'UPDATE spool SET attempts = attempts + 1, state = ?, last_error = ? WHERE seq = ?',
+                [(state, str(error)[:1000], row['seq']) for row in rows]
+            )
+        logger.warning('Error flushing %d spooled submission(s): %s', len(rows), error,
+                       extra={'spool_state': state, 'seqs': [row['seq'] for row in rows]})
+
+
+def is_permanent_error(error):
+    """True if retrying the insert cannot succeed, e.g. a constraint or type error"""
+    if isinstance(error, httpx.TransportError):
+        return False
+    if isinstance(error, APIError):
+        return str(error.code or '').startswith(PERMANENT_ERROR_PREFIXES)
+    if IntegrityError is not None and isinstance(error, (DataError, IntegrityError, ProgrammingError)):
+        return True
+    return False
+
+
+def create_spool():
+    """Create the submission spool if SUBMISSION_SPOOL_PATH is configured"""
+    path = os.getenv('SUBMISSION_SPOOL_PATH')
+    if not path:
+        return None
+    return SubmissionSpool(path, batch_size=int(os.getenv('SUBMISSION_SPOOL_BATCH_SIZE', '100')))
+
+
+# Shared by all requests handled by this worker process (None when spooling is off)
+submission_spool = create_spool()
+
+
+@click.group('spool')
+def spool_cli():
+    """Inspect and replay the submission spool."""
+    if submission_spool is None:
+        raise click.ClickException('SUBMISSION_SPOOL_PATH is not set')
+
+
+@spool_cli.command('status')
+def spool_status():
+    """Show how many submissions are pending or dead."""
+    counts = submission_spool.counts()
+    for state in ('pending', 'dead'):
+        info = counts.get(state, {'count': 0, 'oldest_enqueued_at': None})
+        oldest = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info['oldest_enqueued_at'])) if info['oldest_enqueued_at'] else '-'
+        click.echo(f"{state:8} {info['count']:>8}  oldest: {oldest}")
+
+
+@spool_cli.command('list')
+@click.option('--state', type=click.Choice(['pending', 'dead']), default='pending')
+@click.option('--limit', default=20, show_default=True)
+def spool_list(state, limit):
+    """List spooled submissions in flush order."""
+    for row in submission_spool.pending(limit=limit, state=state):
+        payload = json.loads(row['payload'])
+        click.echo(f"#{row['seq']} {payload.get('submitted_at')} {payload.get('form_type')} "
+                   f"attempts={row['attempts']} {row['last_error'] or ''}")
+
+
+@spool_cli.command('replay')
+@click.option('--dead', is_flag=True, help='Also retry submissions that were given up on.')
+def spool_replay(dead):
+    """Flush the spool to the database now, in order."""
+    lock_file = submission_spool.try_lock()
+    if lock_file is None:
+        raise click.ClickException('A running server is already flushing this spool')
+
+    try:
+        if dead:
+            click.echo(f'Requeued {submission_spool.requeue_dead()} dead submission(s)')
+
+        total = 0
+        while submission_spool.pending(limit=1):
+            flushed, failed = submission_spool.flush()
+            total += flushed
+            if failed:
+                raise click.ClickException(f'Flushed {total} submission(s), then the database failed; run again later')
+        click.echo(f'Flushed {total} submission(s)')
+    finally:
+        lock_file.close()
@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+import time
+
+from app.storage import store
+
+logger = logging.getLogger(__name__)
+
+
+def load_status_counts():
+    """Read per-status application counts with one grouped query"""
+    return store.status_counts()
+
+
+class StatsCache:
+    """Process-level dashboard statistics kept current by the write handlers
+
+    The counts are seeded once from the database and then adjusted in place
+    on every submission, status change and deletion, so reading them costs a
+    dictionary copy. Once they are older than `ttl` seconds they are
+    reconciled against the database on a background thread, which corrects
+    drift from writes made by other worker processes. A result is discarded
+    if this process adjusted the counts while its query was running, since
+    there is no telling whether the snapshot already includes that write;
+    the next read retries the reconcile.
+    """
+
+    def __init__(self, loader, ttl=60):
+        self._loader = loader
+        self.ttl = ttl
+        self._counts = None
+        self._loaded_at = 0.0
+        self._reconciling = False
+        # Bumped by every adjustment, to detect writes racing a reconcile
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current stats, only blocking on the very first load"""
+        if self._counts is None:
+            self.reconcile()
+        elif time.monotonic() - self._loaded_at > self.ttl:
+            self._reconcile_in_background()
+
+        with self._lock:
+            counts = dict(self._counts or {})
+
+        return {
+            'total': sum(counts.values()),
+            'new': counts.get('new', 0),
+            'in_progress': counts.get('in_progress', 0),
+            'completed': counts.get('completed', 0)
+        }
+
+    def reconcile(self):
+        """Replace the cached counts with a fresh read from the database"""
+        with self._lock:
+            generation = self._generation
+        counts = self._loader()
+        with self._lock:
+            stale = self._generation != generation
+            if stale and self._counts is not None:
+                # The adjusted counts stay; retry on the next read
+                return
+            self._counts = dict(counts)
+            # A write during the first load may be missing from it
+            self._loaded_at = 0.0 if stale else time.monotonic()
+
+    def invalidate(self):
+        """Force a reconcile on the next read, e.g. after a bulk change"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def record_insert(self, status, count=1):
+        self._adjust(status, count)
+
+    def record_delete(self, status):
+        self._adjust(status, -1)
+
+    def record_status_change(self, old_status, new_status):
+        if old_status != new_status:
+            self._adjust(old_status, -1)
+            self._adjust(new_status, 1)
+
+    def _adjust(self, status, delta):
+        with self._lock:
+            self._generation += 1
+            # Nothing to adjust before the first load
+            if self._counts is None:
+                return
+            self._counts[status] = max(self._counts.get(status, 0) + delta, 0)
+
+    def _reconcile_in_background(self):
+        with self._lock:
+            if self._reconciling:
+                return
+            self._reconciling = True
+
+        def run():
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception('Error reconciling dashboard stats')
+            finally:
+                self._reconciling = False
+
+        threading.Thread(target=run, name='stats-reconcile', daemon=True).start()
+
+
+# Shared by all requests handled by this worker process
+stats_cache = StatsCache(load_status_counts, ttl=int(os.getenv('STATS_CACHE_TTL', '60')))
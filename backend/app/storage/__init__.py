@@ -0,0 +1,54 @@
+import os
+import threading
+
+from werkzeug.local import LocalProxy
+
+from app.storage.base import ApplicationNotFound, ApplicationStore
+
+# Where applications live: "supabase" (default) or "sqlalchemy" with DATABASE_URL
+storage_backend = os.getenv('STORAGE_BACKEND', 'supabase')
+
+
+def create_store(backend=None, database_url=None):
+    """Create the configured application store"""
+    backend = backend or storage_backend
+    if backend == 'supabase':
+        from app.storage.supabase_store import SupabaseStore
+        return SupabaseStore()
+    if backend == 'sqlalchemy':
+        url = database_url or os.getenv('DATABASE_URL')
+        if not url:
+            raise RuntimeError('STORAGE_BACKEND=sqlalchemy needs DATABASE_URL, e.g. sqlite:///visa_applications.db')
+        try:
+            from app.storage.sql_store import SQLAlchemyStore
+        except ImportError as e:
+            raise RuntimeError('STORAGE_BACKEND=sqlalchemy is set but the SQLAlchemy package is not installed') from e
+        return SQLAlchemyStore(url, pool_size=int(os.getenv('DATABASE_POOL_SIZE', '5')))
+    raise RuntimeError(f'Unknown STORAGE_BACKEND {backend!r}, expected supabase or sqlalchemy')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ApplicationStore:
+    """Return this process's application store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def use_store(new_store):
+    """Replace this process's application store, e.g. with one on a fresh database for a benchmark run"""
+    global _store
+    with _store_lock:
+        _store = new_store
+
+
+# Created lazily, like the Supabase client, so importing never connects
+store: ApplicationStore = LocalProxy(get_store)
+
+__all__ = ['ApplicationNotFound', 'ApplicationStore', 'create_store', 'get_store', 'store', 'storage_backend', 'use_store']
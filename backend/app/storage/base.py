@@ -0,0 +1,102 @@
+import abc
+
+
+class ApplicationNotFound(LookupError):
+    """The requested application does not exist"""
+
+
+class ApplicationStore(abc.ABC):
+    """Where visa applications are kept; route handlers read and write through this
+
+    Rows are plain dicts shaped like PostgREST's JSON for visa_applications:
+    timestamps are ISO-8601 strings in UTC and dates are YYYY-MM-DD. Every
+    write keeps `updated_at`, the deletion tombstones and the analytics
+    rollups current, as the Supabase triggers do.
+
+    `filters` are the dashboard filters from `app.search.parse_filters`.
+    """
+
+    name = None
+
+    # Writes
+
+    @abc.abstractmethod
+    def insert(self, records, ignore_duplicates=False):
+        """Insert records in one batch and return the inserted rows
+
+        With `ignore_duplicates`, records whose submission_key is already
+        stored are skipped and not returned.
+        """
+
+    @abc.abstractmethod
+    def update_status(self, ids, status):
+        """Set the status of the given applications, returning the updated rows"""
+
+    @abc.abstractmethod
+    def delete(self, ids):
+        """Delete the given applications, returning the deleted rows"""
+
+    # Reads
+
+    @abc.abstractmethod
+    def get(self, app_id):
+        """One application, raising ApplicationNotFound if there is none"""
+
+    @abc.abstractmethod
+    def find_by_submission_key(self, submission_key):
+        """The id of the application with this submission_key, or None"""
+
+    @abc.abstractmethod
+    def list_all(self):
+        """Every application, newest first"""
+
+    @abc.abstractmethod
+    def page(self, columns, filters=None, limit=10, offset=0, after=None, count=False):
+        """One dashboard page newest first, returning (rows, total matches or None)
+
+        `after` is a keyset cursor of (submitted_at, id) from the previous
+        page and replaces `offset`. The total is only counted when `count`
+        is set.
+        """
+
+    @abc.abstractmethod
+    def find(self, columns, filters, limit):
+        """Applications matching the filters, by id, at most `limit` of them"""
+
+    @abc.abstractmethod
+    def statuses(self, ids):
+        """{id: status} for those of the ids that exist"""
+
+    @abc.abstractmethod
+    def iter_applications(self, columns, statuses=None, start=None, end=None, page_size=1000):
+        """Yield applications oldest first, one keyset page at a time
+
+        `start` and `end` are aware datetimes bounding submitted_at
+        (end exclusive).
+        """
+
+    @abc.abstractmethod
+    def latest_watermark(self):
+        """The most recent updated_at, or None when there are no applications"""
+
+    @abc.abstractmethod
+    def changes(self, since, limit, columns):
+        """(rows updated after `since`, tombstones of rows deleted after it), at most `limit` of each"""
+
+    @abc.abstractmethod
+    def earliest_submission(self):
+        """The oldest submitted_at, or None when there are no applications"""
+
+    # Aggregates
+
+    @abc.abstractmethod
+    def status_counts(self):
+        """{status: number of applications}"""
+
+    @abc.abstractmethod
+    def trends(self, date_from, date_to, granularity, group_by):
+        """Rows of {bucket, key, count} from the daily rollups, ordered by bucket and key"""
+
+    @abc.abstractmethod
+    def rebuild_rollups(self, date_from, date_to):
+        """Recount the daily rollups for the days from `date_from` to `date_to`, returning the rows written"""
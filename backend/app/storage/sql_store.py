@@ -0,0 +1,340 @@
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytz
+from sqlalchemy import and_, create_engine, delete, event, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import StaticPool
+
+from app.exports import date_bound, parse_export_date
+from app.models import (ROLLUP_DIMENSIONS, metadata, visa_application_daily_counts as daily_counts,
+                        visa_applications as applications, visa_applications_deleted as tombstones)
+from app.search import EQUALITY_FILTERS, SEARCH_COLUMNS
+from app.storage.base import ApplicationNotFound, ApplicationStore
+
+logger = logging.getLogger(__name__)
+
+# The day an application counts towards, as visa_application_day() in the rollup migration
+ROLLUP_TIMEZONE = pytz.timezone('Africa/Johannesburg')
+
+# Dialects with INSERT ... ON CONFLICT, used for submission_key dedup and rollup upserts
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+DATE_COLUMNS = ('travel_date', 'return_date')
+TIMESTAMP_COLUMNS = ('submitted_at', 'created_at', 'updated_at')
+
+
+def to_json(value):
+    """A column value as PostgREST would return it"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def row_dict(row):
+    return {key: to_json(value) for key, value in row._mapping.items()}
+
+
+def parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else pytz.utc.localize(parsed)
+
+
+def rollup_key(row):
+    """The daily_counts primary key a row counts towards"""
+    day = parse_timestamp(row['submitted_at']).astimezone(ROLLUP_TIMEZONE).date()
+    return (day,) + tuple(row.get(column) or '' for column in ROLLUP_DIMENSIONS)
+
+
+def day_start(day):
+    return ROLLUP_TIMEZONE.localize(datetime.combine(day, time.min))
+
+
+class SQLAlchemyStore(ApplicationStore):
+    """Applications in a local SQLite file or a Postgres database reached through SQLAlchemy
+
+    Uses the schema in `app.models`, created on first use. What Supabase
+    does with triggers is done here in the same transaction as each write:
+    updated_at is set, deleted rows leave a tombstone and the daily rollups
+    are adjusted. On SQLite, writes take the database lock up front
+    (BEGIN IMMEDIATE) so concurrent writers queue instead of failing.
+    """
+
+    name = 'sqlalchemy'
+
+    def __init__(self, url, pool_size=5):
+        self.url = url
+        self.pool_size = pool_size
+        self._engine = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Leave the parent's connections alone; this process opens its own
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._create_engine()
+                    metadata.create_all(self._engine)
+        return self._engine
+
+    def _create_engine(self):
+        if not self.url.startswith('sqlite'):
+            return create_engine(self.url, pool_size=self.pool_size, pool_pre_ping=True)
+
+        in_memory = self.url in ('sqlite://', 'sqlite:///:memory:')
+        engine = create_engine(
+            self.url,
+            connect_args={'check_same_thread': False, 'timeout': 30},
+            # An in-memory database only exists on its one connection
+            poolclass=StaticPool if in_memory else None,
+        )
+
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            # Let SQLAlchemy emit BEGIN itself (see on_begin)
+            dbapi_connection.isolation_level = None
+            dbapi_connection.execute('PRAGMA journal_mode=WAL')
+            dbapi_connection.execute('PRAGMA synchronous=NORMAL')
+
+        @event.listens_for(engine, 'begin')
+        def on_begin(conn):
+            conn.exec_driver_sql('BEGIN IMMEDIATE' if conn.get_execution_options().get('write') else 'BEGIN')
+
+        return engine
+
+    def _write(self):
+        return self.engine.execution_options(write=True).begin()
+
+    def _read(self):
+        return self.engine.connect()
+
+    def _upsert(self, table):
+        return UPSERT_DIALECTS[self.engine.dialect.name](table)
+
+    # Writes
+
+    def insert(self, records, ignore_duplicates=False):
+        if not records:
+            return []
+        now = datetime.now(timezone.utc)
+        rows = [self._prepare(record, now) for record in records]
+        # One executemany needs the same keys in every row
+        columns = set().union(*rows)
+        rows = [{column: row.get(column) for column in columns} for row in rows]
+
+        with self._write() as conn:
+            if ignore_duplicates:
+                statement = self._upsert(applications).on_conflict_do_nothing(index_elements=['submission_key'])
+                result = conn.execute(statement.returning(*applications.c), rows)
+            else:
+                result = conn.execute(insert(applications).returning(*applications.c, sort_by_parameter_order=True), rows)
+            inserted = [row._mapping for row in result]
+            self._adjust_rollups(conn, Counter(rollup_key(row) for row in inserted))
+        return [{key: to_json(value) for key, value in row.items()} for row in inserted]
+
+    def _prepare(self, record, now):
+        row = {key: value for key, value in record.items() if key in applications.c and key != 'id'}
+        for column in TIMESTAMP_COLUMNS:
+            if column in row:
+                row[column] = parse_timestamp(row[column])
+        for column in DATE_COLUMNS:
+            if isinstance(row.get(column), str):
+                row[column] = date.fromisoformat(row[column])
+        row.setdefault('status', 'new')
+        row['submitted_at'] = row.get('submitted_at') or now
+        row['created_at'] = row.get('created_at') or now
+        row['updated_at'] = now
+        return row
+
+    def update_status(self, ids, status):
+        if not ids:
+            return []
+        with self._write() as conn:
+            old = conn.execute(select(applications).where(applications.c.id.in_(ids)).with_for_update()).all()
+            if not old:
+                return []
+            new = conn.execute(update(applications).where(applications.c.id.in_(ids))
+                               .values(status=status, updated_at=datetime.now(timezone.utc))
+                               .returning(*applications.c)).all()
+            deltas = Counter(rollup_key(row._mapping) for row in new)
+            deltas.subtract(rollup_key(row._mapping) for row in old)
+            self._adjust_rollups(conn, deltas)
+        return [row_dict(row) for row in new]
+
+    def delete(self, ids):
+        if not ids:
+            return []
+        with self._write() as conn:
+            old = conn.execute(select(applications).where(applications.c.id.in_(ids)).with_for_update()).all()
+            if not old:
+                return []
+            conn.execute(delete(applications).where(applications.c.id.in_([row.id for row in old])))
+            now = datetime.now(timezone.utc)
+            statement = self._upsert(tombstones)
+            conn.execute(statement.on_conflict_do_update(index_elements=['id'], set_={'deleted_at': statement.excluded.deleted_at}),
+                         [{'id': row.id, 'deleted_at': now} for row in old])
+            deltas = Counter()
+            deltas.subtract(rollup_key(row._mapping) for row in old)
+            self._adjust_rollups(conn, deltas)
+        return [row_dict(row) for row in old]
+
+    def _adjust_rollups(self, conn, deltas):
+        rows = [dict(zip(('day',) + ROLLUP_DIMENSIONS, key), count=count) for key, count in deltas.items() if count]
+        if not rows:
+            return
+        statement = self._upsert(daily_counts)
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=['day', *ROLLUP_DIMENSIONS],
+            set_={'count': daily_counts.c['count'] + statement.excluded['count']}
+        ), rows)
+
+    # Reads
+
+    def get(self, app_id):
+        with self._read() as conn:
+            row = conn.execute(select(applications).where(applications.c.id == app_id)).first()
+        if row is None:
+            raise ApplicationNotFound(f'Application {app_id} not found')
+        return row_dict(row)
+
+    def find_by_submission_key(self, submission_key):
+        with self._read() as conn:
+            return conn.execute(select(applications.c.id).where(applications.c.submission_key == submission_key)).scalar()
+
+    def list_all(self):
+        with self._read() as conn:
+            rows = conn.execute(select(applications).order_by(applications.c.submitted_at.desc(), applications.c.id.desc()))
+            return [row_dict(row) for row in rows]
+
+    def page(self, columns, filters=None, limit=10, offset=0, after=None, count=False):
+        conditions = self._conditions(filters or {})
+        query = select(*(applications.c[column] for column in columns)).where(*conditions) \
+            .order_by(applications.c.submitted_at.desc(), applications.c.id.desc()).limit(limit)
+        if after:
+            # Keyset pagination: seek past the last row of the previous page
+            submitted_at, last_id = parse_timestamp(after[0]), after[1]
+            query = query.where(or_(applications.c.submitted_at < submitted_at,
+                                    and_(applications.c.submitted_at == submitted_at, applications.c.id < last_id)))
+        else:
+            query = query.offset(offset)
+        with self._read() as conn:
+            rows = [row_dict(row) for row in conn.execute(query)]
+            total = conn.execute(select(func.count()).select_from(applications).where(*conditions)).scalar() if count else None
+        return rows, total
+
+    def find(self, columns, filters, limit):
+        query = select(*(applications.c[column] for column in columns)).where(*self._conditions(filters)) \
+            .order_by(applications.c.id).limit(limit)
+        with self._read() as conn:
+            return [row_dict(row) for row in conn.execute(query)]
+
+    def _conditions(self, filters):
+        """The dashboard filters as SQL conditions, matching app.search.apply_filters"""
+        conditions = []
+        if 'q' in filters:
+            pattern = f"%{filters['q']}%"
+            conditions.append(or_(*(applications.c[column].ilike(pattern) for column in SEARCH_COLUMNS)))
+        for name in EQUALITY_FILTERS:
+            if name in filters:
+                conditions.append(applications.c[name] == filters[name])
+        if 'submitted_from' in filters:
+            conditions.append(applications.c.submitted_at >= date_bound(parse_export_date(filters['submitted_from'])))
+        if 'submitted_to' in filters:
+            conditions.append(applications.c.submitted_at < date_bound(parse_export_date(filters['submitted_to']), end=True))
+        if 'travel_from' in filters:
+            conditions.append(applications.c.travel_date >= date.fromisoformat(filters['travel_from'][:10]))
+        if 'travel_to' in filters:
+            conditions.append(applications.c.travel_date <= date.fromisoformat(filters['travel_to'][:10]))
+        return conditions
+
+    def statuses(self, ids):
+        with self._read() as conn:
+            return dict(conn.execute(select(applications.c.id, applications.c.status).where(applications.c.id.in_(ids))).all())
+
+    def iter_applications(self, columns, statuses=None, start=None, end=None, page_size=1000):
+        base = select(*(applications.c[column] for column in columns))
+        if statuses:
+            base = base.where(applications.c.status.in_(statuses))
+        if start:
+            base = base.where(applications.c.submitted_at >= start)
+        if end:
+            base = base.where(applications.c.submitted_at < end)
+        base = base.order_by(applications.c.submitted_at, applications.c.id).limit(page_size)
+
+        cursor = None
+        while True:
+            query = base
+            if cursor:
+                submitted_at, last_id = cursor
+                query = query.where(or_(applications.c.submitted_at > submitted_at,
+                                        and_(applications.c.submitted_at == submitted_at, applications.c.id > last_id)))
+            # A short read per page, so a slow consumer never holds a connection
+            with self._read() as conn:
+                rows = conn.execute(query).all()
+            yield from (row_dict(row) for row in rows)
+
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1].submitted_at, rows[-1].id)
+
+    def latest_watermark(self):
+        with self._read() as conn:
+            return to_json(conn.execute(select(func.max(applications.c.updated_at))).scalar())
+
+    def changes(self, since, limit, columns):
+        with self._read() as conn:
+            changed = conn.execute(select(*(applications.c[column] for column in columns))
+                                   .where(applications.c.updated_at > since)
+                                   .order_by(applications.c.updated_at).limit(limit))
+            deleted = conn.execute(select(tombstones).where(tombstones.c.deleted_at > since)
+                                   .order_by(tombstones.c.deleted_at).limit(limit))
+            return [row_dict(row) for row in changed], [row_dict(row) for row in deleted]
+
+    def earliest_submission(self):
+        with self._read() as conn:
+            return to_json(conn.execute(select(func.min(applications.c.submitted_at))).scalar())
+
+    # Aggregates
+
+    def status_counts(self):
+        with self._read() as conn:
+            return dict(conn.execute(select(applications.c.status, func.count()).group_by(applications.c.status)).all())
+
+    def trends(self, date_from, date_to, granularity, group_by):
+        from app.analytics import bucket_start
+
+        key = daily_counts.c[group_by] if group_by in ROLLUP_DIMENSIONS else None
+        query = select(daily_counts.c.day, *([key] if key is not None else []), func.sum(daily_counts.c['count'])) \
+            .where(daily_counts.c.day >= date_from, daily_counts.c.day <= date_to) \
+            .group_by(daily_counts.c.day, *([key] if key is not None else []))
+        totals = Counter()
+        with self._read() as conn:
+            for row in conn.execute(query):
+                totals[bucket_start(row[0], granularity), (row[1] or None) if key is not None else None] += row[-1]
+        return [{'bucket': bucket.isoformat(), 'key': value, 'count': count}
+                for (bucket, value), count in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+                if count]
+
+    def rebuild_rollups(self, date_from, date_to):
+        with self._write() as conn:
+            conn.execute(delete(daily_counts).where(daily_counts.c.day >= date_from, daily_counts.c.day <= date_to))
+            counts = Counter()
+            rows = conn.execute(select(applications.c.submitted_at, *(applications.c[column] for column in ROLLUP_DIMENSIONS))
+                                .where(applications.c.submitted_at >= day_start(date_from),
+                                       applications.c.submitted_at < day_start(date_to + timedelta(days=1))))
+            for row in rows:
+                counts[rollup_key(row._mapping)] += 1
+            self._adjust_rollups(conn, counts)
+        return len(counts)
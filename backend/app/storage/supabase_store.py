@@ -0,0 +1,136 @@
+from app import client_manager
+from app.concurrency import upstream_pool
+from app.search import apply_filters
+from app.storage.base import ApplicationNotFound, ApplicationStore
+
+
+def by_ids(query, ids):
+    """Filter a query to the given ids, as a plain eq for the common single-id case"""
+    return query.eq('id', ids[0]) if len(ids) == 1 else query.in_('id', ids)
+
+
+class SupabaseStore(ApplicationStore):
+    """Applications in Supabase, read and written through PostgREST
+
+    Calls made for a dashboard request run as the signed-in admin, so the
+    table's row level security policies apply; everything else (public
+    submissions, background threads, CLI commands) runs as the service role.
+    See SupabaseClientManager.data_client.
+
+    Triggers in the database maintain updated_at, the deletion tombstones
+    and the analytics rollups (see the supabase_migration_*.sql files).
+    """
+
+    name = 'supabase'
+
+    def _table(self, name='visa_applications'):
+        return client_manager.data_client().table(name)
+
+    # Writes
+
+    def insert(self, records, ignore_duplicates=False):
+        if ignore_duplicates:
+            # A duplicate submission_key inserts nothing and returns no row
+            return self._table().upsert(records, on_conflict='submission_key', ignore_duplicates=True).execute().data
+        return self._table().insert(records).execute().data
+
+    def update_status(self, ids, status):
+        return by_ids(self._table().update({'status': status}), ids).execute().data
+
+    def delete(self, ids):
+        return by_ids(self._table().delete(), ids).execute().data
+
+    # Reads
+
+    def get(self, app_id):
+        rows = self._table().select('*').eq('id', app_id).limit(1).execute().data
+        if not rows:
+            raise ApplicationNotFound(f'Application {app_id} not found')
+        return rows[0]
+
+    def find_by_submission_key(self, submission_key):
+        rows = self._table().select('id').eq('submission_key', submission_key).limit(1).execute().data
+        return rows[0]['id'] if rows else None
+
+    def list_all(self):
+        return self._table().select('*').order('submitted_at', desc=True).execute().data
+
+    def page(self, columns, filters=None, limit=10, offset=0, after=None, count=False):
+        query = self._table().select(', '.join(columns), count='exact' if count else None)
+        query = apply_filters(query, filters or {}).order('submitted_at', desc=True).order('id', desc=True)
+        if after:
+            # Keyset pagination: seek past the last row of the previous page
+            submitted_at, last_id = after
+            query = query.or_(f'submitted_at.lt."{submitted_at}",and(submitted_at.eq."{submitted_at}",id.lt.{last_id})') \
+                .limit(limit)
+        else:
+            query = query.range(offset, offset + limit - 1)
+        result = query.execute()
+        return result.data, (result.count or 0) if count else None
+
+    def find(self, columns, filters, limit):
+        return apply_filters(self._table().select(', '.join(columns)), filters).order('id').limit(limit).execute().data
+
+    def statuses(self, ids):
+        rows = by_ids(self._table().select('id, status'), ids).execute().data
+        return {row['id']: row['status'] for row in rows}
+
+    def iter_applications(self, columns, statuses=None, start=None, end=None, page_size=1000):
+        # Each page continues after the (submitted_at, id) of the previous one,
+        # so every query is an index range scan however deep the export goes
+        cursor = None
+        while True:
+            query = self._table().select(', '.join(columns))
+            if statuses:
+                query = query.in_('status', statuses)
+            if start:
+                query = query.gte('submitted_at', start.isoformat())
+            if end:
+                query = query.lt('submitted_at', end.isoformat())
+            if cursor:
+                submitted_at, last_id = cursor
+                query = query.or_(f'submitted_at.gt."{submitted_at}",and(submitted_at.eq."{submitted_at}",id.gt.{last_id})')
+
+            rows = query.order('submitted_at').order('id').limit(page_size).execute().data
+            yield from rows
+
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]['submitted_at'], rows[-1]['id'])
+
+    def latest_watermark(self):
+        rows = self._table().select('updated_at').order('updated_at', desc=True).limit(1).execute().data
+        return rows[0]['updated_at'] if rows else None
+
+    def changes(self, since, limit, columns):
+        # Independent reads, so send them together
+        return upstream_pool.gather(
+            lambda: self._table().select(', '.join(columns))
+            .gt('updated_at', since.isoformat()).order('updated_at').limit(limit).execute().data,
+            lambda: self._table('visa_applications_deleted').select('id, deleted_at')
+            .gt('deleted_at', since.isoformat()).order('deleted_at').limit(limit).execute().data
+        )
+
+    def earliest_submission(self):
+        rows = self._table().select('submitted_at').order('submitted_at').limit(1).execute().data
+        return rows[0]['submitted_at'] if rows else None
+
+    # Aggregates
+
+    def status_counts(self):
+        rows = client_manager.data_client().rpc('visa_application_status_counts', {}).execute().data
+        return {row['status']: row['count'] for row in rows}
+
+    def trends(self, date_from, date_to, granularity, group_by):
+        return client_manager.data_client().rpc('visa_application_trends', {
+            'p_from': date_from.isoformat(),
+            'p_to': date_to.isoformat(),
+            'p_granularity': granularity,
+            'p_group_by': group_by
+        }).execute().data
+
+    def rebuild_rollups(self, date_from, date_to):
+        # Only the service role may run the recount (see supabase_migration_analytics_rollups.sql)
+        return client_manager.service_client().rpc('rebuild_visa_application_daily_counts', {
+            'p_from': date_from.isoformat(), 'p_to': date_to.isoformat()
+        }).execute().data or 0
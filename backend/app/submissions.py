@@ -0,0 +1,85 @@
+from datetime import date, datetime
+import pytz
+
+from app.events import broadcaster
+from app.mirror import application_mirror
+from app.response_cache import response_cache
+from app.stats import stats_cache
+
+# Map camelCase to snake_case for PostgreSQL
+FIELD_MAPPING = {
+    'countryApplyingFrom': 'country_applying_from',
+    'passportCountry': 'passport_country',
+    'travelDate': 'travel_date',
+    'returnDate': 'return_date',
+    'visaType': 'visa_type',
+    'communicationMethod': 'communication_method'
+}
+
+# Define fields that exist in the database
+ALLOWED_FIELDS = [
+    'name', 'email', 'phone', 'country_applying_from',
+    'passport_country', 'destination', 'travel_date', 'return_date',
+    'visa_type', 'communication_method', 'message'
+]
+
+# Columns that are NOT NULL in visa_applications
+REQUIRED_FIELDS = ['name', 'email', 'phone']
+
+DATE_FIELDS = ['travel_date', 'return_date']
+
+SA_TIMEZONE = pytz.timezone('Africa/Johannesburg')
+
+
+def filter_submission_fields(data):
+    """Convert camelCase form keys to column names and drop unknown or empty fields"""
+    filtered_data = {}
+    for key, value in data.items():
+        # Convert key if it's in the mapping
+        db_key = FIELD_MAPPING.get(key, key)
+        # Only include if it's an allowed field and value is not empty
+        if db_key in ALLOWED_FIELDS and value and value.strip():
+            filtered_data[db_key] = value
+    return filtered_data
+
+
+def normalize_submission(data):
+    """Build the visa_applications row for a raw form submission"""
+    filtered_data = filter_submission_fields(data)
+
+    # Add timestamp and status using South African Time (SAST - UTC+2)
+    filtered_data['submitted_at'] = datetime.now(SA_TIMEZONE).isoformat()
+    filtered_data['status'] = 'new'
+
+    # Determine form type from original data
+    if 'form_type' in data:
+        filtered_data['form_type'] = data['form_type']
+    elif 'communication_method' in filtered_data:
+        filtered_data['form_type'] = 'consultation' if 'message' in filtered_data else 'callback'
+    else:
+        filtered_data['form_type'] = 'unknown'
+
+    return filtered_data
+
+
+def validate_application(record):
+    """Return a list of problems that would make the database reject a normalized row"""
+    errors = [f'{field} is required' for field in REQUIRED_FIELDS if not record.get(field)]
+    if record.get('email') and '@' not in record['email']:
+        errors.append('email is invalid')
+    for field in DATE_FIELDS:
+        if record.get(field):
+            try:
+                date.fromisoformat(record[field])
+            except ValueError:
+                errors.append(f'{field} must be a YYYY-MM-DD date')
+    return errors
+
+
+def record_new_application(application):
+    """Update cached stats and push a newly inserted application to connected dashboards"""
+    stats_cache.record_insert(application.get('status', 'new'))
+    if application_mirror is not None:
+        application_mirror.apply([application])
+    response_cache.invalidate()
+    broadcaster.publish('application.created', lambda: {'application': application, 'stats': stats_cache.get()})
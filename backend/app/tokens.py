@@ -0,0 +1,52 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def decode_claims(token):
+    """Decode the payload of a JWT without verifying it, returning None if malformed
+
+    The claims are only trusted once the token has been verified, either by
+    verify_token or by Supabase Auth (see SessionAuth.claims_for); on their
+    own they are used for bookkeeping such as cache expiry.
+    """
+    try:
+        claims = json.loads(_b64decode(token.split('.')[1]))
+    except (AttributeError, IndexError, ValueError):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def verify_token(token, secret, leeway=30):
+    """Verify an HS256 JWT's signature, expiry and not-before time, returning its claims or None
+
+    Supabase signs access tokens with the project's JWT secret. `leeway`
+    seconds of clock skew are allowed on `nbf`; `exp` is strict, since
+    Supabase would reject the token at that point anyway.
+    """
+    try:
+        header_segment, payload_segment, signature_segment = token.split('.')
+        header = json.loads(_b64decode(header_segment))
+        signature = _b64decode(signature_segment)
+    except (AttributeError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get('alg') != 'HS256':
+        return None
+
+    expected = hmac.new(secret.encode(), f'{header_segment}.{payload_segment}'.encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+
+    claims = decode_claims(token)
+    now = time.time()
+    if claims is None or not isinstance(claims.get('exp'), (int, float)) or claims['exp'] <= now:
+        return None
+    if isinstance(claims.get('nbf'), (int, float)) and claims['nbf'] > now + leeway:
+        return None
+    return claims
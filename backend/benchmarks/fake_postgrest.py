@@ -0,0 +1,489 @@
+"""In-process stand-in for the Supabase/PostgREST table API used by the benchmarks.
+
+It implements the subset of PostgREST the app uses (select, filters, or/and
+trees, order, offset/limit, counts, insert/upsert, update, delete and the
+dashboard RPCs) over in-memory rows, and is served through
+``httpx.MockTransport`` so no network is involved. Like the real database it
+keeps a few "indexes" so that paging and change queries don't scan the
+whole table.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote
+
+import httpx
+
+TIMESTAMP_COLUMNS = {'submitted_at', 'updated_at', 'created_at', 'deleted_at'}
+
+STATUSES = ['new', 'in_progress', 'completed', 'cancelled']
+FORM_TYPES = ['callback', 'consultation', 'visa']
+DESTINATIONS = ['United Kingdom', 'Canada', 'United States', 'Schengen', 'Australia', 'UAE']
+VISA_TYPES = ['tourist', 'business', 'student', 'work']
+ROLLUP_DIMENSIONS = ('destination', 'visa_type', 'form_type', 'status')
+SA_OFFSET = timedelta(hours=2)  # Africa/Johannesburg has no daylight saving
+
+
+def utc_timestamp(value=None):
+    """Format a datetime (or now) the way Postgres returns timestamptz: fixed-width UTC"""
+    value = value or datetime.now(timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+
+def normalize_timestamp(value):
+    try:
+        return utc_timestamp(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except (AttributeError, ValueError):
+        return value
+
+
+def sa_day(timestamp):
+    """The South African calendar day of a stored timestamp, as YYYY-MM-DD"""
+    return (datetime.fromisoformat(timestamp) + SA_OFFSET).date().isoformat()
+
+
+def truncate_day(day, granularity):
+    value = datetime.fromisoformat(day).date()
+    if granularity == 'week':
+        value -= timedelta(days=value.weekday())
+    elif granularity == 'month':
+        value = value.replace(day=1)
+    return value.isoformat()
+
+
+class FakeTable:
+    def __init__(self, name):
+        self.name = name
+        self.rows = []        # ordered by (submitted_at, id) ascending, like the dashboard index
+        self.by_id = {}
+        self.by_submission_key = {}   # the unique submission_key index
+        self.changes = []     # (updated_at, id) in write order, like an updated_at index
+        self.next_id = 1
+
+    def insert(self, record):
+        row = dict(record)
+        row['id'] = self.next_id
+        self.next_id += 1
+        now = utc_timestamp()
+        for column in TIMESTAMP_COLUMNS & row.keys():
+            row[column] = normalize_timestamp(row[column])
+        row.setdefault('submitted_at', now)
+        row.setdefault('created_at', now)
+        row.setdefault('status', 'new')
+        row['updated_at'] = now
+        self.rows.append(row)
+        self.by_id[row['id']] = row
+        if row.get('submission_key') is not None:
+            self.by_submission_key[row['submission_key']] = row
+        self.changes.append((now, row['id']))
+        return row
+
+    def remove(self, row):
+        if self.by_submission_key.get(row.get('submission_key')) is row:
+            del self.by_submission_key[row['submission_key']]
+        # Locate the row through the (submitted_at, id) ordering instead of a linear scan
+        key = (row['submitted_at'], row['id'])
+        index = bisect_left(self.rows, key, key=lambda item: (item['submitted_at'], item['id']))
+        if index < len(self.rows) and self.rows[index] is row:
+            del self.rows[index]
+        else:
+            self.rows.remove(row)
+
+    def latest_changes(self):
+        """Yield live rows newest-change first, each once, from the change log"""
+        seen = set()
+        for updated_at, row_id in reversed(self.changes):
+            row = self.by_id.get(row_id)
+            if row is None or row_id in seen or row['updated_at'] != updated_at:
+                continue
+            seen.add(row_id)
+            yield row
+
+
+class FakePostgrest:
+    """Thread-safe in-memory PostgREST serving visa_applications and its side tables"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.applications = FakeTable('visa_applications')
+        self.tombstones = []  # (deleted_at, id)
+        self.status_counts = Counter()
+        self.requests = 0
+
+    # Seeding
+
+    def seed(self, count, days=365):
+        """Create `count` applications spread over the last `days` days"""
+        start = datetime.now(timezone.utc) - timedelta(days=days)
+        step = timedelta(days=days) / max(count, 1)
+        table = self.applications
+        for i in range(count):
+            submitted = utc_timestamp(start + step * i)
+            status = STATUSES[i % len(STATUSES)]
+            row = {
+                'id': table.next_id,
+                'name': f'Applicant {i}',
+                'email': f'applicant{i}@example.com',
+                'phone': f'+2771{i:07d}',
+                'destination': DESTINATIONS[i % len(DESTINATIONS)],
+                'visa_type': VISA_TYPES[i % len(VISA_TYPES)],
+                'form_type': FORM_TYPES[i % len(FORM_TYPES)],
+                'travel_date': (start + step * i + timedelta(days=30)).date().isoformat(),
+                'status': status,
+                'submitted_at': submitted,
+                'created_at': submitted,
+                'updated_at': submitted,
+            }
+            table.next_id += 1
+            table.rows.append(row)
+            table.by_id[row['id']] = row
+            table.changes.append((submitted, row['id']))
+            self.status_counts[status] += 1
+
+    def touch(self, count):
+        """Mark the `count` newest applications as just updated, like recent dashboard activity"""
+        table = self.applications
+        now = utc_timestamp()
+        for row in table.rows[-count:]:
+            row['updated_at'] = now
+            table.changes.append((now, row['id']))
+
+    # Transport
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        if request.url.path == '/auth/v1/user':
+            # Session tokens are checked with Supabase Auth when no JWT secret is set
+            return httpx.Response(200, json={'id': 'bench-admin', 'role': 'authenticated'})
+        path = request.url.path.split('/rest/v1/', 1)[-1].strip('/')
+        params = parse_query(request.url.query.decode())
+        with self.lock:
+            self.requests += 1
+            try:
+                if path.startswith('rpc/'):
+                    return self.rpc(path[4:], request, params)
+                if path == 'visa_applications_deleted':
+                    return self.select_tombstones(request, params)
+                if path != 'visa_applications':
+                    return error(404, '42P01', f'relation "{path}" does not exist')
+                handler = {
+                    'GET': self.select, 'HEAD': self.select, 'POST': self.insert,
+                    'PATCH': self.update, 'DELETE': self.delete,
+                }[request.method]
+                return handler(request, params)
+            except QueryError as e:
+                return error(400, 'PGRST100', str(e))
+
+    # Operations
+
+    def select(self, request, params):
+        rows, total = self.query(params, request.headers.get('prefer', ''))
+        return respond(request, project(rows, params.get('select')), total=total)
+
+    def insert(self, request, params):
+        body = json.loads(request.content or b'[]')
+        records = body if isinstance(body, list) else [body]
+        prefer = request.headers.get('prefer', '')
+        conflict = params.get('on_conflict')
+        table = self.applications
+
+        inserted = []
+        for record in records:
+            if conflict and record.get(conflict) is not None:
+                if conflict == 'submission_key':
+                    existing = table.by_submission_key.get(record[conflict])
+                else:
+                    existing = next((row for row in reversed(table.rows) if row.get(conflict) == record[conflict]), None)
+                if existing is not None:
+                    if 'ignore-duplicates' in prefer:
+                        continue
+                    if 'merge-duplicates' not in prefer:
+                        return error(409, '23505', 'duplicate key value violates unique constraint')
+            row = table.insert(record)
+            self.status_counts[row['status']] += 1
+            inserted.append(row)
+        return respond(request, project(inserted, params.get('select')), status=201)
+
+    def update(self, request, params):
+        changes = json.loads(request.content or b'{}')
+        rows, _ = self.query(params, '')
+        now = utc_timestamp()
+        for row in rows:
+            if 'status' in changes:
+                self.status_counts[row['status']] -= 1
+                self.status_counts[changes['status']] += 1
+            row.update(changes)
+            row['updated_at'] = now
+            self.applications.changes.append((now, row['id']))
+        return respond(request, project(rows, params.get('select')))
+
+    def delete(self, request, params):
+        rows, _ = self.query(params, '')
+        table = self.applications
+        now = utc_timestamp()
+        if len(rows) == 1:
+            table.remove(rows[0])
+        elif rows:
+            doomed = {row['id'] for row in rows}
+            table.rows = [row for row in table.rows if row['id'] not in doomed]
+        for row in rows:
+            del table.by_id[row['id']]
+            self.status_counts[row['status']] -= 1
+            self.tombstones.append((now, row['id']))
+        return respond(request, project(rows, params.get('select')))
+
+    def select_tombstones(self, request, params):
+        rows = [{'id': row_id, 'deleted_at': deleted_at} for deleted_at, row_id in self.tombstones]
+        rows = [row for row in rows if matches(row, params['filters'])]
+        rows = paginate(sort_rows(rows, params.get('order', [])), params)
+        return respond(request, project(rows, params.get('select')))
+
+    def rpc(self, name, request, params):
+        if name == 'visa_application_status_counts':
+            rows = [{'status': status, 'count': count} for status, count in self.status_counts.items() if count]
+            return respond(request, rows)
+        if name in ('visa_application_trends', 'rebuild_visa_application_daily_counts'):
+            return self.rollups(name, request, json.loads(request.content or b'{}'))
+        return error(404, 'PGRST202', f'Could not find the function public.{name}')
+
+    def rollups(self, name, request, args):
+        """The analytics RPCs, answered from the rows as the rollup triggers would keep them"""
+        date_from = args.get('p_from') or '0000-00-00'
+        date_to = args.get('p_to') or '9999-99-99'
+        counts = Counter()
+        for row in self.applications.rows:
+            day = sa_day(row['submitted_at'])
+            if date_from <= day <= date_to:
+                counts[day, tuple(row.get(column) or '' for column in ROLLUP_DIMENSIONS)] += 1
+        if name == 'rebuild_visa_application_daily_counts':
+            return httpx.Response(200, json=len(counts))
+
+        granularity = args.get('p_granularity', 'day')
+        group_by = args.get('p_group_by')
+        trends = Counter()
+        for (day, values), count in counts.items():
+            key = values[ROLLUP_DIMENSIONS.index(group_by)] if group_by in ROLLUP_DIMENSIONS else ''
+            trends[truncate_day(day, granularity), key or None] += count
+        rows = [{'bucket': bucket, 'key': key, 'count': count}
+                for (bucket, key), count in sorted(trends.items(), key=lambda item: (item[0][0], item[0][1] or ''))]
+        return respond(request, rows)
+
+    # Query planning
+
+    def query(self, params, prefer):
+        """Return (matching rows after order/offset/limit, exact total or None)"""
+        table = self.applications
+        filters = params['filters']
+        order = params.get('order', [])
+        want_count = 'count=exact' in prefer
+
+        candidates, ordered = self.candidates(filters, order)
+        matched = (row for row in candidates if matches(row, filters))
+
+        if not ordered:
+            matched = sort_rows(list(matched), order)
+
+        if want_count:
+            matched = list(matched)
+            return paginate(matched, params), len(matched)
+
+        # Stop scanning once the requested page is complete
+        offset = int(params.get('offset', 0))
+        limit = params.get('limit')
+        page = []
+        for index, row in enumerate(matched):
+            if index < offset:
+                continue
+            if limit is not None and len(page) >= int(limit):
+                break
+            page.append(row)
+        return page, None
+
+    def candidates(self, filters, order):
+        """Pick an access path, returning (iterable of rows, whether already in the requested order)"""
+        table = self.applications
+        columns = [column for column, _ in order]
+
+        id_filter = next((value for column, op, value in filters if column == 'id' and op == 'eq'), None)
+        if id_filter is not None:
+            row = table.by_id.get(int(id_filter))
+            return ([row] if row else []), True
+
+        if columns[:1] == ['updated_at'] and not order[0][1]:
+            since = next((value for column, op, value in filters if column == 'updated_at' and op in ('gt', 'gte')), None)
+            if since is not None:
+                start = bisect_right(table.changes, (normalize_timestamp(since),))
+                seen = {}
+                for _, row_id in table.changes[start:]:
+                    row = table.by_id.get(row_id)
+                    if row is not None:
+                        seen[row_id] = row
+                return sorted(seen.values(), key=lambda row: row['updated_at']), True
+
+        if columns[:1] == ['submitted_at'] and order[0][1]:
+            return reversed(table.rows), True
+
+        if columns[:1] == ['updated_at'] and order[0][1]:
+            return table.latest_changes(), True
+
+        return table.rows, not order
+
+
+class QueryError(Exception):
+    pass
+
+
+# Query string parsing
+
+OPERATORS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in', 'like', 'ilike', 'is', 'not')
+RESERVED_PARAMS = ('select', 'order', 'offset', 'limit', 'on_conflict', 'columns', 'or', 'and')
+
+
+def parse_query(query):
+    params = {'filters': []}
+    for part in query.split('&') if query else []:
+        key, _, value = part.partition('=')
+        key, value = unquote(key), unquote(value.replace('+', ' '))
+        if key == 'order':
+            params['order'] = [(item.split('.')[0], '.desc' in item) for item in value.split(',')]
+        elif key in ('or', 'and'):
+            params['filters'].append((key, 'tree', parse_tree(value.strip()[1:-1])))
+        elif key in RESERVED_PARAMS:
+            params[key] = value
+        else:
+            op, _, operand = value.partition('.')
+            if op not in OPERATORS:
+                raise QueryError(f'unknown operator {op}')
+            params['filters'].append((key, op, operand))
+    return params
+
+
+def split_top_level(text):
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+
+def parse_tree(text):
+    """Parse the inside of or=(...) into a list of conditions and nested trees"""
+    conditions = []
+    for part in split_top_level(text):
+        if part.startswith(('and(', 'or(')):
+            kind, _, inner = part.partition('(')
+            conditions.append((kind, 'tree', parse_tree(inner[:-1])))
+        else:
+            column, _, rest = part.partition('.')
+            op, _, operand = rest.partition('.')
+            conditions.append((column, op, operand.strip('"')))
+    return conditions
+
+
+# Filtering, ordering and output
+
+def compare_value(column, value):
+    if column in TIMESTAMP_COLUMNS:
+        return normalize_timestamp(value)
+    return value
+
+
+def matches(row, filters):
+    for column, op, operand in filters:
+        if op == 'tree':
+            results = (matches(row, [condition]) for condition in operand)
+            if not (any(results) if column == 'or' else all(results)):
+                return False
+            continue
+
+        value = row.get(column)
+        if op == 'is':
+            if (operand == 'null') != (value is None):
+                return False
+            continue
+        if op == 'in':
+            options = [item.strip('"') for item in operand.strip('()').split(',')]
+            if str(value) not in options:
+                return False
+            continue
+        if value is None:
+            return False
+
+        if op in ('like', 'ilike'):
+            needle = operand.replace('*', '%').strip('%')
+            haystack, needle = (str(value).lower(), needle.lower()) if op == 'ilike' else (str(value), needle)
+            if needle not in haystack:
+                return False
+            continue
+
+        operand = compare_value(column, operand)
+        if isinstance(value, int):
+            operand = int(operand)
+        if op == 'eq' and not value == operand:
+            return False
+        if op == 'neq' and not value != operand:
+            return False
+        if op == 'gt' and not value > operand:
+            return False
+        if op == 'gte' and not value >= operand:
+            return False
+        if op == 'lt' and not value < operand:
+            return False
+        if op == 'lte' and not value <= operand:
+            return False
+    return True
+
+
+def sort_rows(rows, order):
+    for column, descending in reversed(order):
+        rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or ''), reverse=descending)
+    return rows
+
+
+def paginate(rows, params):
+    offset = int(params.get('offset', 0))
+    limit = params.get('limit')
+    return rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+
+
+def project(rows, select):
+    if not select or select == '*':
+        return [dict(row) for row in rows]
+    columns = [column.strip() for column in select.split(',')]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def respond(request, rows, status=200, total=None):
+    headers = {'Content-Type': 'application/json'}
+    if total is not None or request.method == 'GET':
+        span = f'0-{len(rows) - 1}' if rows else '*'
+        headers['Content-Range'] = f"{span}/{total if total is not None else '*'}"
+    if 'return=minimal' in request.headers.get('prefer', ''):
+        return httpx.Response(status, headers=headers)
+    if 'vnd.pgrst.object' in request.headers.get('accept', ''):
+        if len(rows) != 1:
+            return error(406, 'PGRST116', 'JSON object requested, multiple (or no) rows returned')
+        return httpx.Response(status, headers=headers, content=json.dumps(rows[0]))
+    return httpx.Response(status, headers=headers, content=json.dumps(rows))
+
+
+def error(status, code, message):
+    return httpx.Response(status, json={'code': code, 'message': message, 'details': None, 'hint': None})
@@ -0,0 +1,325 @@
+"""Load benchmark for the Flask app against an in-process fake PostgREST
+
+Run from the backend directory:
+
+    python -m benchmarks.run --rows 1000,100000 --save benchmarks/baseline.json
+    python -m benchmarks.run --rows 1000,100000 --compare benchmarks/baseline.json
+
+Each table size is seeded into a fresh fake, then every scenario is driven
+through the Flask test client by `--concurrency` threads. With `--storage
+sqlalchemy` the applications are seeded into a fresh SQLite file instead and
+the fake only answers what stays on Supabase (admin token refreshes). Results report
+throughput and p50/p95/p99 latency; `--compare` exits non-zero when a
+scenario regresses by more than `--tolerance` against a saved baseline.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# The app reads its configuration at import time; point it at the fake
+# before anything from `app` is imported (dotenv never overrides these)
+os.environ.setdefault('SUPABASE_URL', 'http://postgrest.bench')
+os.environ.setdefault('SUPABASE_KEY', 'bench.anon.key')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'bench.service.key')
+os.environ['SUBMISSION_SPOOL_PATH'] = ''
+os.environ.setdefault('SECRET_KEY', 'bench-secret')
+# Per-request INFO logs would dominate the report; override to measure them
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+# Every benchmark client shares one address; measure the handlers, not the limiter
+os.environ.setdefault('RATE_LIMIT_SUBMIT_IP', '0')
+os.environ.setdefault('RATE_LIMIT_SUBMIT_IDENTITY', '0')
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_postgrest import FakePostgrest, STATUSES  # noqa: E402
+
+DEFAULT_SCENARIOS = ['dashboard', 'refresh', 'submit', 'status', 'delete']
+# Whole-table payloads, meant for comparing serialization and compression at modest --rows
+OPTIONAL_SCENARIOS = ['list', 'refresh_full']
+
+
+def make_token(lifetime=86400):
+    """Unsigned JWT with a future expiry, enough for the app's claims decode"""
+    def encode(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b'=').decode()
+    claims = {'sub': 'bench-admin', 'role': 'authenticated', 'exp': int(time.time()) + lifetime}
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}.bench"
+
+
+class Harness:
+    """Holds the app, the current fake and per-scenario request builders"""
+
+    def __init__(self, latency, accept_encoding=None, storage='supabase'):
+        from app import create_app, client_manager
+        from app.stats import stats_cache
+
+        self.latency = latency
+        self.storage = storage
+        self.database_dir = tempfile.mkdtemp(prefix='visa-bench-') if storage == 'sqlalchemy' else None
+        self.accept_encoding = accept_encoding
+        self.fake = None
+        self.stats_cache = stats_cache
+        self.token = make_token()
+        self.lock = threading.Lock()
+        # Every pooled PostgREST session goes through this transport, so
+        # swapping `self.fake` re-targets the whole app
+        client_manager.transport = httpx.MockTransport(lambda request: self.fake.handle(request))
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+
+    def load(self, rows):
+        self.fake = FakePostgrest(latency=self.latency)
+        self.fake.seed(rows)
+        self.fake.touch(20)
+        self.watermark = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+        if self.storage == 'sqlalchemy':
+            self.seed_database(rows)
+        self.stats_cache.reconcile()
+        self.deletable = list(self.fake.applications.by_id)
+        random.shuffle(self.deletable)
+
+    def seed_database(self, rows, batch_size=5000):
+        """Copy the fake's applications into a fresh SQLite database and make it the app's store"""
+        from sqlalchemy import insert
+
+        from app.models import visa_applications
+        from app.storage import use_store
+        from app.storage.sql_store import SQLAlchemyStore, parse_timestamp
+
+        store = SQLAlchemyStore(f'sqlite:///{os.path.join(self.database_dir, f"applications-{rows}.db")}')
+        # Written directly so the rows keep the fake's timestamps (store.insert stamps updated_at)
+        applications = [
+            dict(row, travel_date=datetime.fromisoformat(row['travel_date']).date(),
+                 **{column: parse_timestamp(row[column]) for column in ('submitted_at', 'created_at', 'updated_at')})
+            for row in self.fake.applications.rows
+        ]
+        with store.engine.begin() as conn:
+            for start in range(0, len(applications), batch_size):
+                conn.execute(insert(visa_applications), applications[start:start + batch_size])
+        if applications:
+            days = [row['submitted_at'].date() for row in (applications[0], applications[-1])]
+            store.rebuild_rollups(days[0] - timedelta(days=1), days[1] + timedelta(days=1))
+        use_store(store)
+
+    def client(self):
+        client = self.app.test_client()
+        if self.accept_encoding:
+            client.environ_base['HTTP_ACCEPT_ENCODING'] = self.accept_encoding
+        with client.session_transaction() as session:
+            session['access_token'] = self.token
+            session['user_email'] = 'bench@example.com'
+        return client
+
+    def existing_id(self):
+        with self.fake.lock:
+            ids = self.fake.applications.rows
+            return ids[random.randrange(len(ids))]['id'] if ids else 0
+
+    def next_deletable(self):
+        with self.lock:
+            return self.deletable.pop() if self.deletable else 0
+
+    # Scenarios: each issues one request with the given test client
+
+    def dashboard(self, client, max_page):
+        pages = max(1, min(max_page, (len(self.fake.applications.rows) + 19) // 20))
+        return client.get(f'/admin?page={random.randint(1, pages)}')
+
+    def refresh(self, client, max_page):
+        return client.get('/api/applications/refresh', query_string={'since': self.watermark})
+
+    def list(self, client, max_page):
+        return client.get('/api/applications')
+
+    def refresh_full(self, client, max_page):
+        return client.get('/api/applications/refresh')
+
+    def submit(self, client, max_page):
+        n = random.randrange(10 ** 7)
+        return client.post('/api/visa', data={
+            'name': f'Bench Applicant {n}',
+            'email': f'bench{n}@example.com',
+            'phone': f'+2772{n:07d}',
+            'destination': 'Canada',
+            'visaType': 'tourist',
+            'travelDate': '2030-01-15',
+            'formType': 'visa',
+        })
+
+    def status(self, client, max_page):
+        return client.put(f'/api/applications/{self.existing_id()}/status',
+                          json={'status': random.choice(STATUSES)})
+
+    def delete(self, client, max_page):
+        return client.delete(f'/api/applications/{self.next_deletable()}')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(harness, name, requests, concurrency, max_page):
+    """Drive `requests` calls of a scenario across threads and summarize the timings"""
+    scenario = getattr(harness, name)
+    latencies, failures, sizes = [], [], []
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+
+    def worker():
+        client = harness.client()
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return
+            started = time.perf_counter()
+            response = scenario(client, max_page)
+            elapsed = time.perf_counter() - started
+            body = response.get_data()
+            latencies.append(elapsed)
+            sizes.append(len(body))
+            if response.status_code >= 400:
+                failures.append(response.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(failures),
+        'throughput': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'cpu_ms': round(cpu / len(latencies) * 1000, 3) if latencies else 0.0,
+        'avg_bytes': round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression descriptions against a saved baseline"""
+    regressions = []
+    for rows, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = baseline.get('results', {}).get(rows, {}).get(name)
+            if not previous:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{rows} rows / {name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if current['throughput'] < previous['throughput'] * (1 - tolerance):
+                regressions.append(f"{rows} rows / {name}: throughput {previous['throughput']}/s -> {current['throughput']}/s")
+    return regressions
+
+
+def print_results(rows, scenarios, baseline=None):
+    print(f'\n{rows} rows')
+    print(f"  {'scenario':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms':>8} {'bytes':>9} {'errors':>6}  vs baseline p95")
+    for name, result in scenarios.items():
+        delta = ''
+        previous = (baseline or {}).get('results', {}).get(rows, {}).get(name)
+        if previous and previous['p95_ms']:
+            delta = f"{(result['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%"
+        print(f"  {name:<10} {result['throughput']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['p99_ms']:>9} {result.get('cpu_ms', '-'):>8} {result['avg_bytes']:>9} {result['errors']:>6}  {delta}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the API against an in-process fake PostgREST')
+    parser.add_argument('--rows', default='1000,100000',
+                        help='comma separated table sizes to seed (e.g. 1000,100000,1000000)')
+    parser.add_argument('--requests', type=int, default=300, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per scenario')
+    parser.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS),
+                        help=f"comma separated subset of {','.join(DEFAULT_SCENARIOS + OPTIONAL_SCENARIOS)}")
+    parser.add_argument('--max-page', type=int, default=100, help='highest dashboard page to sample')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='simulated network latency added to every upstream call')
+    parser.add_argument('--accept-encoding', default='gzip, br',
+                        help="Accept-Encoding sent by the clients; '' for uncompressed responses")
+    parser.add_argument('--storage', choices=['supabase', 'sqlalchemy'], default='supabase',
+                        help='application store to benchmark: the fake PostgREST or a local SQLite file')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for reproducible request mixes')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a baseline JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a baseline and fail on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown before --compare fails (default 0.2)')
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(DEFAULT_SCENARIOS + OPTIONAL_SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    random.seed(args.seed)
+    if args.storage == 'sqlalchemy':
+        # Read when `app.storage` is imported; the database itself is swapped in per table size
+        os.environ['STORAGE_BACKEND'] = 'sqlalchemy'
+        os.environ['APPLICATION_MIRROR_PATH'] = ''
+    harness = Harness(latency=args.latency_ms / 1000, accept_encoding=args.accept_encoding, storage=args.storage)
+    results = {}
+    for rows in [int(value) for value in args.rows.split(',')]:
+        seed_started = time.perf_counter()
+        harness.load(rows)
+        print(f'Seeded {rows} rows in {time.perf_counter() - seed_started:.1f}s', file=sys.stderr)
+        results[str(rows)] = {
+            name: run_scenario(harness, name, args.requests, args.concurrency, args.max_page)
+            for name in scenarios
+        }
+        print_results(str(rows), results[str(rows)], baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'settings': {
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'max_page': args.max_page,
+                    'latency_ms': args.latency_ms,
+                    'seed': args.seed,
+                    'storage': args.storage,
+                    'accept_encoding': args.accept_encoding,
+                    'json_provider': type(harness.app.json).__name__,
+                },
+                'results': results,
+            }, f, indent=2)
+        print(f'\nSaved baseline to {args.save}')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\nRegressions beyond tolerance:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print('\nNo regressions beyond tolerance')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Startup and first-request latency of the app against the fake PostgREST
+
+Run from the backend directory:
+
+    python -m benchmarks.startup --runs 5 --latency-ms 20
+
+Every run is a fresh interpreter, so imports and the first Supabase client,
+connection and stats load are all cold. Reports the median of each stage:
+importing `app`, `create_app()`, building the Supabase client as a gunicorn
+worker does after it forks, the first dashboard request and the next one.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STAGES = ['import_ms', 'create_app_ms', 'warm_up_ms', 'first_request_ms', 'second_request_ms']
+
+
+def measure(rows, latency):
+    """Time one cold start in this process; must run before anything imports `app`"""
+    started = time.perf_counter()
+    # Importing the benchmark module sets the fake's environment, then `app` itself
+    from benchmarks.run import Harness
+    from benchmarks.fake_postgrest import FakePostgrest
+    import app  # noqa: F401
+    imported = time.perf_counter()
+
+    harness = Harness(latency)
+    created = time.perf_counter()
+
+    # What gunicorn's post_worker_init hook does in each worker
+    from app import client_manager
+    client_manager.warm_up()
+    warmed = time.perf_counter()
+
+    # Seed without Harness.load, which would warm the stats cache
+    harness.fake = FakePostgrest(latency=latency)
+    harness.fake.seed(rows)
+    client = harness.client()
+    timings = []
+    for _ in range(2):
+        request_started = time.perf_counter()
+        response = client.get('/admin')
+        timings.append(time.perf_counter() - request_started)
+        if response.status_code != 200:
+            raise RuntimeError(f'/admin returned {response.status_code}')
+
+    return {
+        'import_ms': (imported - started) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'warm_up_ms': (warmed - created) * 1000,
+        'first_request_ms': timings[0] * 1000,
+        'second_request_ms': timings[1] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure app startup and first-request latency')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--rows', type=int, default=1000, help='rows seeded into the fake')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='simulated network latency added to every upstream call')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.rows, args.latency_ms / 1000)))
+        return 0
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.startup', '--child',
+             '--rows', str(args.rows), '--latency-ms', str(args.latency_ms)],
+            check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f'{args.runs} cold starts, median of each stage')
+    for stage in STAGES:
+        values = [run[stage] for run in runs]
+        print(f'  {stage:<18} {statistics.median(values):>9.1f}   (min {min(values):.1f}, max {max(values):.1f})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Gunicorn settings for the VisaPro backend
+
+Requests spend most of their time waiting on Supabase, and dashboard event
+streams stay open for minutes, so each worker runs many threads rather than
+many processes being started. Every value can be overridden with the
+environment variables below or on the gunicorn command line.
+"""
+import os
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Threaded workers: a request waiting on Supabase parks a thread, and all
+# threads of a worker share one keep-alive HTTP/2 connection pool
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+
+# Import the app once in the master and fork workers from it: workers boot
+# faster and share the imported code pages. Safe because nothing connects
+# at import time; Supabase clients, connection pools, the log writer and the
+# spool reopen themselves in each worker through os.register_at_fork hooks.
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+
+# Recycle workers now and then to cap slow memory growth; the jitter keeps
+# them from restarting together. Open event streams reconnect on their own.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+# Worker heartbeat timeout; gthread heartbeats run beside long requests
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+# The app writes its own JSON access log; gunicorn's errors go to stderr
+accesslog = None
+errorlog = '-'
+
+_started_at = time.monotonic()
+
+
+def when_ready(server):
+    server.log.info('Master ready in %.0f ms (preload=%s)', (time.monotonic() - _started_at) * 1000, server.cfg.preload_app)
+
+
+def post_worker_init(worker):
+    # Build this worker's Supabase clients before it accepts requests, so the
+    # first request does not pay for it (no network call is made)
+    from app import client_manager
+    client_manager.warm_up()
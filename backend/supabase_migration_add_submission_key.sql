@@ -0,0 +1,19 @@
+-- Migration: Add submission_key for idempotent submissions
+-- Run this SQL in your Supabase SQL Editor
+
+-- Every submission to /api/visa carries a submission_key: the applicant's
+-- email and phone within the dedup window, or the client's Idempotency-Key
+-- when applicant dedup is off. The unique index makes the database ignore
+-- duplicates that reach different worker processes, and spooled batches
+-- that are retried after a lost response.
+ALTER TABLE visa_applications
+ADD COLUMN IF NOT EXISTS submission_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_submission_key ON visa_applications(submission_key);
+
+COMMENT ON COLUMN visa_applications.submission_key IS 'Unique key of the submission (applicant within the dedup window, or idempotency key), used to make inserts idempotent';
+
+-- Verify the unique index exists
+SELECT indexname, indexdef FROM pg_indexes
+WHERE tablename = 'visa_applications'
+AND indexname = 'idx_submission_key';
@@ -0,0 +1,70 @@
+-- Migration: Track changes to visa_applications for incremental dashboard refresh
+-- Run this SQL in your Supabase SQL Editor
+
+-- Add the updated_at column used as the change watermark
+ALTER TABLE visa_applications
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- Backfill existing records so every row has a watermark
+UPDATE visa_applications
+SET updated_at = COALESCE(submitted_at, created_at, NOW())
+WHERE updated_at IS NULL;
+
+ALTER TABLE visa_applications ALTER COLUMN updated_at SET NOT NULL;
+
+COMMENT ON COLUMN visa_applications.updated_at IS 'Last time the row was inserted or modified, used by /api/applications/refresh?since=';
+
+-- Bump updated_at on every insert and update
+CREATE OR REPLACE FUNCTION set_visa_applications_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = clock_timestamp();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_visa_applications_updated_at ON visa_applications;
+CREATE TRIGGER trg_visa_applications_updated_at
+  BEFORE INSERT OR UPDATE ON visa_applications
+  FOR EACH ROW EXECUTE FUNCTION set_visa_applications_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_updated_at ON visa_applications(updated_at);
+
+-- Tombstones for deleted rows so dashboards can drop them without a full reload
+CREATE TABLE IF NOT EXISTS visa_applications_deleted (
+  id BIGINT PRIMARY KEY,
+  deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_deleted_at ON visa_applications_deleted(deleted_at);
+
+CREATE OR REPLACE FUNCTION record_visa_application_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO visa_applications_deleted (id, deleted_at)
+  VALUES (OLD.id, clock_timestamp())
+  ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+DROP TRIGGER IF EXISTS trg_visa_applications_deleted ON visa_applications;
+CREATE TRIGGER trg_visa_applications_deleted
+  AFTER DELETE ON visa_applications
+  FOR EACH ROW EXECUTE FUNCTION record_visa_application_deletion();
+
+-- Allow the admin dashboard to read tombstones
+ALTER TABLE visa_applications_deleted ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow authenticated read" ON visa_applications_deleted
+  FOR SELECT TO authenticated
+  USING (true);
+
+-- Optional: prune tombstones older than the 7 day delta window (run periodically)
+-- DELETE FROM visa_applications_deleted WHERE deleted_at < NOW() - INTERVAL '7 days';
+
+-- Verify the column was added
+SELECT column_name, data_type, is_nullable
+FROM information_schema.columns
+WHERE table_name = 'visa_applications'
+AND column_name = 'updated_at';
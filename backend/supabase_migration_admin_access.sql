@@ -0,0 +1,23 @@
+-- Migration: Let signed-in admins insert and delete applications
+-- Run this SQL in your Supabase SQL Editor
+--
+-- Dashboard requests reach PostgREST with the admin's own access token, so
+-- row level security decides what they may do. The base schema only lets
+-- the authenticated role read and update; bulk imports also insert and the
+-- dashboard deletes. Public submissions and background work use the service
+-- role, which bypasses these policies.
+
+DROP POLICY IF EXISTS "Allow authenticated insert" ON visa_applications;
+CREATE POLICY "Allow authenticated insert" ON visa_applications
+  FOR INSERT TO authenticated
+  WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow authenticated delete" ON visa_applications;
+CREATE POLICY "Allow authenticated delete" ON visa_applications
+  FOR DELETE TO authenticated
+  USING (true);
+
+-- Verify the policies
+SELECT policyname, cmd, roles
+FROM pg_policies
+WHERE tablename = 'visa_applications';
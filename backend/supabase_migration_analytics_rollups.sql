@@ -0,0 +1,151 @@
+-- Migration: Daily submission rollups for /api/analytics
+-- Run this SQL in your Supabase SQL Editor
+
+-- One row per South African calendar day and destination / visa type / form
+-- type / status combination, holding how many applications it has. Missing
+-- values are stored as '' because they are part of the primary key.
+CREATE TABLE IF NOT EXISTS visa_application_daily_counts (
+  day DATE NOT NULL,
+  destination TEXT NOT NULL DEFAULT '',
+  visa_type TEXT NOT NULL DEFAULT '',
+  form_type TEXT NOT NULL DEFAULT '',
+  status TEXT NOT NULL DEFAULT '',
+  count BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, destination, visa_type, form_type, status)
+);
+
+COMMENT ON TABLE visa_application_daily_counts IS 'Applications per day and dimension, kept current by triggers on visa_applications';
+
+-- The day an application counts towards, the same day the dashboard shows
+CREATE OR REPLACE FUNCTION visa_application_day(submitted_at TIMESTAMP WITH TIME ZONE)
+RETURNS DATE AS $$
+  SELECT (submitted_at AT TIME ZONE 'Africa/Johannesburg')::date;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Statement-level triggers: a bulk insert, update or delete of many rows adds
+-- one grouped upsert to its statement instead of one per row. Updates that do
+-- not touch a rolled-up column net out to zero and write nothing.
+CREATE OR REPLACE FUNCTION apply_visa_application_daily_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO visa_application_daily_counts (day, destination, visa_type, form_type, status, count)
+    SELECT visa_application_day(submitted_at), COALESCE(destination, ''), COALESCE(visa_type, ''),
+           COALESCE(form_type, ''), COALESCE(status, ''), COUNT(*)
+    FROM new_rows
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (day, destination, visa_type, form_type, status)
+    DO UPDATE SET count = visa_application_daily_counts.count + EXCLUDED.count;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO visa_application_daily_counts (day, destination, visa_type, form_type, status, count)
+    SELECT visa_application_day(submitted_at), COALESCE(destination, ''), COALESCE(visa_type, ''),
+           COALESCE(form_type, ''), COALESCE(status, ''), -COUNT(*)
+    FROM old_rows
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (day, destination, visa_type, form_type, status)
+    DO UPDATE SET count = visa_application_daily_counts.count + EXCLUDED.count;
+  ELSE
+    INSERT INTO visa_application_daily_counts (day, destination, visa_type, form_type, status, count)
+    SELECT day, destination, visa_type, form_type, status, SUM(delta)
+    FROM (
+      SELECT visa_application_day(submitted_at) AS day, COALESCE(destination, '') AS destination,
+             COALESCE(visa_type, '') AS visa_type, COALESCE(form_type, '') AS form_type,
+             COALESCE(status, '') AS status, 1 AS delta
+      FROM new_rows
+      UNION ALL
+      SELECT visa_application_day(submitted_at), COALESCE(destination, ''), COALESCE(visa_type, ''),
+             COALESCE(form_type, ''), COALESCE(status, ''), -1
+      FROM old_rows
+    ) changes
+    GROUP BY 1, 2, 3, 4, 5
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (day, destination, visa_type, form_type, status)
+    DO UPDATE SET count = visa_application_daily_counts.count + EXCLUDED.count;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+DROP TRIGGER IF EXISTS trg_visa_application_daily_insert ON visa_applications;
+CREATE TRIGGER trg_visa_application_daily_insert
+  AFTER INSERT ON visa_applications
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION apply_visa_application_daily_counts();
+
+DROP TRIGGER IF EXISTS trg_visa_application_daily_update ON visa_applications;
+CREATE TRIGGER trg_visa_application_daily_update
+  AFTER UPDATE ON visa_applications
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION apply_visa_application_daily_counts();
+
+DROP TRIGGER IF EXISTS trg_visa_application_daily_delete ON visa_applications;
+CREATE TRIGGER trg_visa_application_daily_delete
+  AFTER DELETE ON visa_applications
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION apply_visa_application_daily_counts();
+
+-- Recount the days from p_from to p_to (inclusive, NULL for open-ended) from
+-- visa_applications. Used for the initial backfill and to repair drift; the
+-- table lock waits for in-flight writes and holds new ones back until the
+-- recount commits, so run it over a bounded range at a time.
+CREATE OR REPLACE FUNCTION rebuild_visa_application_daily_counts(p_from DATE DEFAULT NULL, p_to DATE DEFAULT NULL)
+RETURNS BIGINT AS $$
+DECLARE
+  written BIGINT;
+BEGIN
+  LOCK TABLE visa_application_daily_counts IN SHARE ROW EXCLUSIVE MODE;
+
+  DELETE FROM visa_application_daily_counts
+  WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+
+  INSERT INTO visa_application_daily_counts (day, destination, visa_type, form_type, status, count)
+  SELECT visa_application_day(submitted_at), COALESCE(destination, ''), COALESCE(visa_type, ''),
+         COALESCE(form_type, ''), COALESCE(status, ''), COUNT(*)
+  FROM visa_applications
+  WHERE (p_from IS NULL OR submitted_at >= (p_from::timestamp AT TIME ZONE 'Africa/Johannesburg'))
+    AND (p_to IS NULL OR submitted_at < ((p_to + 1)::timestamp AT TIME ZONE 'Africa/Johannesburg'))
+  GROUP BY 1, 2, 3, 4, 5;
+
+  GET DIAGNOSTICS written = ROW_COUNT;
+  RETURN written;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+-- Submission counts per day, week or month between two days, optionally split
+-- by one dimension. Reads only the rollup rows in the range and returns one
+-- row per bucket and value.
+CREATE OR REPLACE FUNCTION visa_application_trends(
+  p_from DATE, p_to DATE, p_granularity TEXT DEFAULT 'day', p_group_by TEXT DEFAULT NULL)
+RETURNS TABLE (bucket DATE, key TEXT, count BIGINT) AS $$
+  SELECT date_trunc(p_granularity, day)::date AS bucket,
+         NULLIF(CASE p_group_by
+           WHEN 'destination' THEN destination
+           WHEN 'visa_type' THEN visa_type
+           WHEN 'form_type' THEN form_type
+           WHEN 'status' THEN status
+         END, '') AS key,
+         SUM(count)::bigint AS count
+  FROM visa_application_daily_counts
+  WHERE day >= p_from AND day <= p_to
+  GROUP BY 1, 2
+  HAVING SUM(count) <> 0
+  ORDER BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+ALTER TABLE visa_application_daily_counts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow authenticated read" ON visa_application_daily_counts
+  FOR SELECT TO authenticated
+  USING (true);
+
+GRANT EXECUTE ON FUNCTION visa_application_trends(DATE, DATE, TEXT, TEXT) TO authenticated;
+-- The recount locks the rollups, so only the service role (flask analytics backfill) may run it
+REVOKE EXECUTE ON FUNCTION rebuild_visa_application_daily_counts(DATE, DATE) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION rebuild_visa_application_daily_counts(DATE, DATE) TO service_role;
+
+-- Fill the table from existing applications
+SELECT rebuild_visa_application_daily_counts();
+
+-- Verify the rollups match the table
+SELECT (SELECT SUM(count) FROM visa_application_daily_counts) AS rolled_up,
+       (SELECT COUNT(*) FROM visa_applications) AS applications;
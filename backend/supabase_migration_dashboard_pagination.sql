@@ -0,0 +1,17 @@
+-- Migration: Database-side pagination and status counts for the admin dashboard
+-- Run this SQL in your Supabase SQL Editor
+
+-- Ordered index matching the dashboard sort, so each page is an index range scan
+-- and keyset pagination (?after=<submitted_at>|<id>) stays constant-time
+CREATE INDEX IF NOT EXISTS idx_submitted_at_id ON visa_applications(submitted_at DESC, id DESC);
+
+-- Status counts in a single grouped query instead of fetching every row
+CREATE OR REPLACE FUNCTION visa_application_status_counts()
+RETURNS TABLE (status TEXT, count BIGINT) AS $$
+  SELECT status, COUNT(*) FROM visa_applications GROUP BY status;
+$$ LANGUAGE sql STABLE;
+
+GRANT EXECUTE ON FUNCTION visa_application_status_counts() TO authenticated;
+
+-- Verify the function returns counts
+SELECT * FROM visa_application_status_counts();
@@ -0,0 +1,31 @@
+-- Migration: Indexes for dashboard search and filters
+-- Run this SQL in your Supabase SQL Editor
+
+-- Trigram indexes so substring searches (name/email/phone ILIKE '%term%')
+-- use a bitmap index scan instead of reading every row
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_name_trgm ON visa_applications USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_email_trgm ON visa_applications USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_phone_trgm ON visa_applications USING gin (phone gin_trgm_ops);
+
+-- Equality filter plus the dashboard sort, so a filtered page is one ordered
+-- index range scan and its count only touches matching rows
+CREATE INDEX IF NOT EXISTS idx_status_submitted_at ON visa_applications(status, submitted_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_form_type_submitted_at ON visa_applications(form_type, submitted_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_visa_type_submitted_at ON visa_applications(visa_type, submitted_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_destination_submitted_at ON visa_applications(destination, submitted_at DESC, id DESC);
+
+-- Travel date range filter
+CREATE INDEX IF NOT EXISTS idx_travel_date ON visa_applications(travel_date);
+
+-- The composite indexes lead with the same columns, so the original
+-- single-column indexes are no longer needed
+DROP INDEX IF EXISTS idx_status;
+DROP INDEX IF EXISTS idx_form_type;
+
+-- Refresh planner statistics for the new indexes
+ANALYZE visa_applications;
+
+-- Verify the indexes exist
+SELECT indexname FROM pg_indexes WHERE tablename = 'visa_applications' ORDER BY indexname;
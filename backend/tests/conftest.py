@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The app reads its configuration at import time; keep the tests off any
+# real Supabase project, spool or mirror (dotenv never overrides these)
+os.environ.setdefault('SUPABASE_URL', 'http://supabase.test')
+os.environ.setdefault('SUPABASE_KEY', 'test.anon.key')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'test.service.key')
+os.environ['SUBMISSION_SPOOL_PATH'] = ''
+os.environ['APPLICATION_MIRROR_PATH'] = ''
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
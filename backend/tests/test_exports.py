@@ -0,0 +1,26 @@
+import csv
+import io
+
+from app.exports import csv_chunks, escape_formula
+
+
+def read_csv(rows):
+    return list(csv.DictReader(io.StringIO(''.join(csv_chunks(rows)))))
+
+
+def test_formula_cells_are_quoted():
+    for value in ('=HYPERLINK("http://example.com")', '+27711234567', '-1+1', '@SUM(A1)', '\tx', '\rx'):
+        assert escape_formula(value) == "'" + value
+
+
+def test_plain_cells_are_unchanged():
+    for value in ('Ann Lee', 'a=b', '', 12, None):
+        assert escape_formula(value) == value
+
+
+def test_csv_export_escapes_every_column():
+    rows = read_csv([{'id': 1, 'name': '=cmd|"/c calc"!A1', 'message': '@now', 'destination': 'Canada'}])
+    assert rows[0]['id'] == '1'
+    assert rows[0]['name'] == '\'=cmd|"/c calc"!A1'
+    assert rows[0]['message'] == "'@now"
+    assert rows[0]['destination'] == 'Canada'
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from app import idempotency
+from app.idempotency import SubmissionDedup, lead_fingerprint
+
+APPLICANT = {'email': 'Ann@Example.com ', 'phone': '+27 71 123 4567'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Pin the wall clock the lead windows are computed from"""
+    now = [1_000_000_000.0]
+    monkeypatch.setattr(idempotency.time, 'time', lambda: now[0])
+    return now
+
+
+def test_lead_fingerprint_normalizes_email_and_phone():
+    assert lead_fingerprint(APPLICANT) == lead_fingerprint({'email': 'ann@example.com', 'phone': '27711234567'})
+    assert lead_fingerprint({'email': '', 'phone': ''}) is None
+
+
+def test_claim_then_replay():
+    dedup = SubmissionDedup()
+    keys = dedup.keys_for('key-00000001', APPLICANT)
+    claim = dedup.claim(keys)
+    assert claim.replay is None
+    claim.complete(({'id': 1}, 200))
+
+    # Either key alone finds the outcome
+    assert dedup.claim(keys[:1]).replay == ({'id': 1}, 200)
+    assert dedup.claim(dedup.keys_for('key-00000002', APPLICANT)).replay == ({'id': 1}, 200)
+
+
+def test_release_lets_a_retry_through():
+    dedup = SubmissionDedup()
+    keys = dedup.keys_for('key-00000001', APPLICANT)
+    claim = dedup.claim(keys)
+    claim.release()
+    claim.release()
+    assert dedup.claim(keys).replay is None
+
+
+def test_duplicate_waits_for_the_first_submission():
+    dedup = SubmissionDedup(wait=5.0)
+    keys = dedup.keys_for('key-00000001', APPLICANT)
+    first = dedup.claim(keys)
+    result = {}
+
+    thread = threading.Thread(target=lambda: result.update(claim=dedup.claim(keys)))
+    thread.start()
+    first.complete(({'id': 7}, 200))
+    thread.join(5)
+    assert result['claim'].replay == ({'id': 7}, 200)
+
+
+def test_stuck_claim_is_given_up_after_the_wait():
+    dedup = SubmissionDedup(wait=0.05)
+    keys = dedup.keys_for(None, APPLICANT)
+    dedup.claim(keys)
+    assert dedup.claim(keys).replay is None
+
+
+def test_lead_window_boundaries(clock):
+    dedup = SubmissionDedup(window=600)
+    clock[0] = 600 * 1_000_000
+    start = dedup.keys_for(None, APPLICANT)
+
+    clock[0] += 599.9
+    assert dedup.keys_for(None, APPLICANT) == start
+
+    # One window later the same applicant gets a new key, however close in time
+    clock[0] += 0.1
+    assert dedup.keys_for(None, APPLICANT) != start
+
+
+def test_lead_outcome_expires_with_the_window(clock, monkeypatch):
+    monotonic = [0.0]
+    monkeypatch.setattr(idempotency.time, 'monotonic', lambda: monotonic[0])
+    dedup = SubmissionDedup(window=600, key_ttl=86400)
+    dedup.claim(dedup.keys_for('key-00000001', APPLICANT)).complete(({'id': 1}, 200))
+
+    monotonic[0] = 601
+    assert dedup.claim(dedup.keys_for(None, APPLICANT)).replay is None
+    assert dedup.claim(['key:key-00000001']).replay == ({'id': 1}, 200)
+
+
+def test_submission_key_prefers_the_lead_key(clock):
+    dedup = SubmissionDedup(window=600)
+    keys = dedup.keys_for('key-00000001', APPLICANT)
+    # Fresh idempotency keys from the same applicant share one row key
+    assert dedup.submission_key(keys) == dedup.submission_key(dedup.keys_for('key-00000002', APPLICANT))
+    assert dedup.submission_key(keys).startswith('lead:')
+
+
+def test_submission_key_without_a_lead():
+    assert SubmissionDedup(window=0).submission_key(['key:key-00000001']) == 'key:key-00000001'
+    assert SubmissionDedup().submission_key([])
+    assert SubmissionDedup().submission_key([]) != SubmissionDedup().submission_key([])
+
+
+def test_same_lead_on_two_workers_is_stored_once(tmp_path, clock):
+    pytest.importorskip('sqlalchemy')
+    from app.storage.sql_store import SQLAlchemyStore
+
+    store = SQLAlchemyStore(f'sqlite:///{tmp_path / "applications.db"}')
+    inserted = []
+    # Each worker has its own memory, and the form sends a fresh idempotency key each time
+    for worker, idempotency_key in ((SubmissionDedup(), 'key-00000001'), (SubmissionDedup(), 'key-00000002')):
+        keys = worker.keys_for(idempotency_key, APPLICANT)
+        assert worker.claim(keys).replay is None
+        record = dict(APPLICANT, name='Ann Lee', status='new', submission_key=worker.submission_key(keys))
+        inserted.append(store.insert([record], ignore_duplicates=True))
+
+    assert len(inserted[0]) == 1
+    assert inserted[1] == []
@@ -0,0 +1,78 @@
+import pytest
+from flask import Flask
+
+from app.ratelimit import AdmissionControl, MemoryBucketBackend, parse_rate
+
+# One token an hour: nothing refills while a test runs
+RATE = 1 / 3600
+
+
+def test_take_all_charges_every_bucket_when_all_allow():
+    backend = MemoryBucketBackend()
+    assert backend.take_all(['email', 'phone'], RATE, 2) == (True, 0.0, None)
+    assert backend.take_all(['email', 'phone'], RATE, 2)[0]
+    assert not backend.take('email', RATE, 2)[0]
+    assert not backend.take('phone', RATE, 2)[0]
+
+
+def test_take_all_refusal_charges_no_bucket():
+    backend = MemoryBucketBackend()
+    assert backend.take('phone', RATE, 1)[0]
+
+    allowed, retry_after, refused = backend.take_all(['email', 'phone'], RATE, 1)
+    assert not allowed
+    assert refused == 1
+    assert retry_after == pytest.approx(3600, rel=0.01)
+    # The email bucket was not charged for the refused submission
+    assert backend.take('email', RATE, 1)[0]
+
+
+def test_take_all_reports_the_first_refused_key():
+    backend = MemoryBucketBackend()
+    backend.take_all(['email', 'phone'], RATE, 1)
+    assert backend.take_all(['email', 'phone'], RATE, 1)[2] == 0
+
+
+def test_buckets_refill_over_time():
+    backend = MemoryBucketBackend()
+    assert backend.take('ip', 1000.0, 1)[0]
+    allowed, retry_after = backend.take('ip', 1000.0, 1)
+    assert not allowed and 0 < retry_after <= 0.001
+
+
+def test_least_recently_used_keys_are_evicted():
+    backend = MemoryBucketBackend(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        backend.take(key, RATE, 1)
+    # "a" was evicted and starts again with a full bucket
+    assert backend.take('a', RATE, 1)[0]
+    assert not backend.take('c', RATE, 1)[0]
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('10/minute', (10 / 60, 10)),
+    ('5/hour', (5 / 3600, 5)),
+    ('3', (3.0, 3)),
+    ('0', None),
+    ('', None),
+])
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+
+@pytest.mark.parametrize('value', ['ten/minute', '5/fortnight', '-1/minute'])
+def test_parse_rate_rejects_invalid_values(value):
+    with pytest.raises(ValueError):
+        parse_rate(value)
+
+
+def test_check_identity_rejects_without_charging_the_other_bucket():
+    admission = AdmissionControl('submit', MemoryBucketBackend(), identity_rate=(RATE, 1))
+    with Flask(__name__).app_context():
+        assert admission.check_identity({'email': 'Ann@Example.com', 'phone': '+27 71 123 4567'}) is None
+
+        # Same phone, new email: refused on the phone, and the new email keeps its token
+        response = admission.check_identity({'email': 'other@example.com', 'phone': '+27711234567'})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 0
+        assert admission.check_identity({'email': 'other@example.com'}) is None
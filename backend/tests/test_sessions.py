@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask, g, session
+
+from app import client_manager
+from app.clients import request_access_token, use_access_token
+from app.sessions import SessionAuth
+from app.tokens import verify_token
+
+SECRET = 'test-jwt-secret-' * 3
+
+
+def encode(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b'=').decode()
+
+
+def make_token(lifetime, secret=SECRET):
+    signing_input = f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'sub': 'admin', 'exp': int(time.time()) + lifetime})}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f'{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b"=").decode()}'
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    """Stand-in for Supabase Auth's refresh grant, recording each call"""
+    calls = []
+
+    def refresh_session(refresh_token):
+        calls.append(refresh_token)
+        time.sleep(0.1)
+        if refresh_token == 'revoked':
+            raise RuntimeError('invalid_grant')
+        return {'access_token': make_token(3600), 'refresh_token': f'{refresh_token}-next'}
+
+    monkeypatch.setattr(client_manager, 'refresh_session', refresh_session)
+    return calls
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    return app
+
+
+def authenticate(app, auth, access_token, refresh_token='r1'):
+    with app.test_request_context():
+        session['access_token'] = access_token
+        session['refresh_token'] = refresh_token
+        claims = auth.authenticate()
+        return claims, dict(session), getattr(g, 'auth_claims', None)
+
+
+def test_verify_token():
+    assert verify_token(make_token(60), SECRET)['sub'] == 'admin'
+    assert verify_token(make_token(60, 'another-secret'), SECRET) is None
+    assert verify_token(make_token(-1), SECRET) is None
+    assert verify_token('not-a-token', SECRET) is None
+
+
+def test_token_far_from_expiry_is_not_refreshed(app, refreshes):
+    auth = SessionAuth(SECRET, refresh_margin=300)
+    token = make_token(3600)
+    claims, stored, g_claims = authenticate(app, auth, token)
+    assert claims['sub'] == 'admin' and g_claims is claims
+    assert stored['access_token'] == token
+    assert refreshes == []
+
+
+def test_near_expiry_token_is_refreshed(app, refreshes):
+    auth = SessionAuth(SECRET, refresh_margin=300)
+    claims, stored, _ = authenticate(app, auth, make_token(60))
+    assert refreshes == ['r1']
+    assert stored['refresh_token'] == 'r1-next'
+    assert claims['exp'] > time.time() + 3000
+
+
+def test_failed_refresh_keeps_a_still_valid_token(app, refreshes):
+    auth = SessionAuth(SECRET, refresh_margin=300)
+    token = make_token(60)
+    claims, stored, _ = authenticate(app, auth, token, 'revoked')
+    assert claims is not None
+    assert stored['access_token'] == token
+
+
+def test_expired_token_without_refresh_is_rejected(app, refreshes):
+    auth = SessionAuth(SECRET, refresh_margin=300)
+    claims, _, _ = authenticate(app, auth, make_token(-10), 'revoked')
+    assert claims is None
+
+
+def test_concurrent_requests_of_one_session_share_a_refresh(refreshes):
+    auth = SessionAuth(SECRET, refresh_margin=300)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(auth.refresh('r1'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Serialized per refresh token: one call to Supabase Auth, one result for all
+    assert refreshes == ['r1']
+    assert len({result['access_token'] for result in results}) == 1
+
+
+def test_refreshes_of_different_sessions_do_not_wait_on_each_other(refreshes):
+    auth = SessionAuth(SECRET, refresh_margin=300)
+    threads = [threading.Thread(target=auth.refresh, args=(f'session-{i}',)) for i in range(4)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(refreshes) == [f'session-{i}' for i in range(4)]
+    # Four 100 ms refreshes in parallel, not one after another
+    assert time.monotonic() - started < 0.3
+    assert auth._refresh_locks == {}
+
+
+def test_without_a_secret_tokens_are_checked_with_supabase_auth(monkeypatch):
+    checked = []
+    monkeypatch.setattr(client_manager, 'get_user', lambda token: checked.append(token) or {'id': 'admin'})
+    auth = SessionAuth(None)
+    token = make_token(3600, 'unknown-secret')
+    assert auth.claims_for(token)['sub'] == 'admin'
+    assert auth.claims_for(token)['sub'] == 'admin'
+    assert checked == [token]
+
+    def reject(token):
+        raise RuntimeError('401 Unauthorized')
+
+    monkeypatch.setattr(client_manager, 'get_user', reject)
+    assert auth.claims_for(make_token(3600, 'forged')) is None
+
+
+def test_data_calls_run_as_the_current_token():
+    token = make_token(3600)
+    with use_access_token(token):
+        assert client_manager.data_client().session.headers['authorization'] == f'Bearer {token}'
+    assert request_access_token.get() is None
+    # No admin session behind the call: the service role
+    assert client_manager.data_client().session.headers['authorization'] == 'Bearer test.service.key'
+
+
+def test_login_required_sends_the_refreshed_token(app, refreshes, monkeypatch):
+    from app import routes
+
+    monkeypatch.setattr(routes, 'session_auth', SessionAuth(SECRET, refresh_margin=300))
+    app.add_url_rule('/admin/probe', 'probe', routes.login_required(lambda: request_access_token.get() or ''))
+    client = app.test_client()
+    with client.session_transaction() as stored:
+        stored['access_token'] = make_token(60)
+        stored['refresh_token'] = 'r1'
+
+    used = client.get('/admin/probe').get_data(as_text=True)
+    with client.session_transaction() as stored:
+        assert used == stored['access_token']
+    assert refreshes == ['r1']
@@ -0,0 +1,122 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.storage import ApplicationNotFound, ApplicationStore
+
+pytest.importorskip('sqlalchemy')
+from app.storage.sql_store import SQLAlchemyStore  # noqa: E402
+
+COLUMNS = ['id', 'name', 'email', 'destination', 'status', 'submitted_at', 'updated_at']
+START = datetime(2025, 3, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def application(i, **values):
+    return dict({
+        'name': f'Applicant {i}',
+        'email': f'applicant{i}@example.com',
+        'phone': f'+2771{i:07d}',
+        'destination': ('Canada', 'Schengen', 'UAE')[i % 3],
+        'visa_type': 'tourist',
+        'form_type': 'consultation',
+        'travel_date': '2025-06-01',
+        'status': 'new',
+        'submitted_at': (START + timedelta(days=i)).isoformat(),
+    }, **values)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLAlchemyStore(f'sqlite:///{tmp_path / "applications.db"}')
+    store.insert([application(i) for i in range(6)])
+    return store
+
+
+def test_sql_store_implements_the_interface():
+    assert issubclass(SQLAlchemyStore, ApplicationStore)
+    assert not SQLAlchemyStore.__abstractmethods__
+    assert SQLAlchemyStore.name == 'sqlalchemy'
+
+
+def test_insert_returns_rows_shaped_like_postgrest(store):
+    row = store.insert([application(10, submission_key='lead:abc:1')])[0]
+    assert isinstance(row['id'], int)
+    assert row['travel_date'] == '2025-06-01'
+    assert datetime.fromisoformat(row['submitted_at']) == START + timedelta(days=10)
+    assert datetime.fromisoformat(row['updated_at']).tzinfo is not None
+    assert store.get(row['id'])['name'] == 'Applicant 10'
+
+
+def test_duplicate_submission_key_is_ignored(store):
+    first = store.insert([application(10, submission_key='lead:abc:1')], ignore_duplicates=True)
+    assert store.insert([application(11, submission_key='lead:abc:1')], ignore_duplicates=True) == []
+    assert store.find_by_submission_key('lead:abc:1') == first[0]['id']
+    assert store.find_by_submission_key('lead:other:1') is None
+
+
+def test_get_missing_application(store):
+    with pytest.raises(ApplicationNotFound):
+        store.get(10_000)
+
+
+def test_update_status_moves_the_watermark(store):
+    before = store.latest_watermark()
+    updated = store.update_status([2, 3], 'completed')
+    assert sorted(row['id'] for row in updated) == [2, 3]
+    assert store.statuses([2, 3, 4, 10_000]) == {2: 'completed', 3: 'completed', 4: 'new'}
+    assert store.latest_watermark() > before
+    assert store.status_counts() == {'new': 4, 'completed': 2}
+
+
+def test_delete_leaves_a_tombstone(store):
+    since = datetime.now(timezone.utc) - timedelta(seconds=1)
+    deleted = store.delete([1])
+    assert [row['id'] for row in deleted] == [1]
+    changed, tombstones = store.changes(since, 100, COLUMNS)
+    assert [row['id'] for row in tombstones] == [1]
+    assert 1 not in [row['id'] for row in changed]
+    assert 1 not in [row['id'] for row in store.list_all()]
+
+
+def test_list_all_is_newest_first(store):
+    rows = store.list_all()
+    assert [row['id'] for row in rows] == sorted((row['id'] for row in rows), reverse=True)
+
+
+def test_keyset_pages_match_offset_pages(store):
+    first, total = store.page(COLUMNS, limit=4, count=True)
+    assert total == 6
+    cursor = (first[-1]['submitted_at'], first[-1]['id'])
+    assert store.page(COLUMNS, limit=4, after=cursor)[0] == store.page(COLUMNS, limit=4, offset=4)[0]
+
+
+def test_filters(store):
+    rows, total = store.page(COLUMNS, {'destination': 'Canada'}, count=True)
+    assert total == 2 and {row['destination'] for row in rows} == {'Canada'}
+    assert [row['id'] for row in store.find(COLUMNS, {'q': 'applicant3@'}, 10)] == [4]
+    assert len(store.find(COLUMNS, {'submitted_from': '2025-03-03', 'submitted_to': '2025-03-04'}, 10)) == 2
+
+
+def test_iter_applications_pages_oldest_first_within_bounds(store):
+    rows = list(store.iter_applications(COLUMNS, statuses=['new'], start=START + timedelta(days=1),
+                                        end=START + timedelta(days=5), page_size=2))
+    assert [row['name'] for row in rows] == [f'Applicant {i}' for i in range(1, 5)]
+
+
+def test_earliest_submission(store):
+    assert datetime.fromisoformat(store.earliest_submission()) == START
+
+
+def test_trends_follow_writes_and_rebuild(store):
+    def trends():
+        return store.trends(date(2025, 3, 1), date(2025, 3, 31), 'month', 'status')
+
+    store.update_status([1], 'completed')
+    store.delete([2])
+    expected = [{'bucket': '2025-03-01', 'key': 'completed', 'count': 1},
+                {'bucket': '2025-03-01', 'key': 'new', 'count': 4}]
+    assert trends() == expected
+
+    # Recounting from the table gives the same rollups the writes maintained
+    store.rebuild_rollups(date(2025, 3, 1), date(2025, 3, 31))
+    assert trends() == expected
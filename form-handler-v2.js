@@ -15,8 +15,22 @@ $(document).ready(function() {
     const API_BASE_URL = 'https://visa-backend-h11c.onrender.com/api';
     // const API_BASE_URL = 'http://localhost:5000/api'; // For local development // Use this when deployed to Render
 
+    // One key per submission attempt; the backend answers repeats of the same key
+    // (double clicks, the fetch + iframe pair below) with the first response
+    function newIdempotencyKey() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return 'idem-' + Date.now().toString(36) + '-' + Math.random().toString(36).substr(2, 12);
+    }
+
     // Reusable form submission handler
     function handleFormSubmit($form, endpoint) {
+        // Ignore clicks while this form's submission is still in flight
+        if ($form.data('submitting')) {
+            return;
+        }
+
         const $submitBtn = $form.find('button[type="submit"]');
         const $msgDiv = $form.find('.form-message');
         const formId = $form.attr('id');
@@ -43,6 +57,7 @@ $(document).ready(function() {
         
         // Add a unique identifier
         formData.submission_id = 'sub_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+        formData.idempotency_key = newIdempotencyKey();
         
         // Add debug info
         formData.debug_info = 'Submitted using form-handler-v2.js with x-www-form-urlencoded';
@@ -57,6 +72,7 @@ $(document).ready(function() {
         }
 
         // Show loading state
+        $form.data('submitting', true);
         $submitBtn.prop('disabled', true).text('Submitting...');
         $msgDiv.html('').hide();
 
@@ -109,6 +125,7 @@ $(document).ready(function() {
             }
             
             // Reset button state
+            $form.data('submitting', false);
             $submitBtn.prop('disabled', false).text(originalBtnText);
         }
 
@@ -131,6 +148,7 @@ $(document).ready(function() {
             }
             
             // Reset button state
+            $form.data('submitting', false);
             $submitBtn.prop('disabled', false).text(originalBtnText);
         }
     }
@@ -156,6 +174,7 @@ $(document).ready(function() {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/x-www-form-urlencoded', // Try with form-urlencoded
+                    'Idempotency-Key': formData.idempotency_key
                 },
                 body: params // Send as url-encoded form data instead of JSON or multipart
             })